@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import, unicode_literals
 
+import hashlib
+import io
 import os
+import threading
 import zipfile
 
 import pytest
@@ -10,6 +13,11 @@ from unihan_etl import constants, process
 from unihan_etl.process import DEFAULT_OPTIONS, Packager
 from unihan_etl.util import merge_dict
 
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:  # python 2
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
 
 @pytest.fixture
 def test_options():
@@ -92,11 +100,34 @@ def normalized_data(columns, fixture_files):
     return process.normalize(data, columns)
 
 
+@pytest.fixture(scope="session")
+def field_values(fixture_files):
+    """Return raw values in fixtures, keyed by field."""
+    values = {}
+    for line in process.load_data(files=fixture_files):
+        if process.not_junk(line):
+            ucn, field, value = line.strip().split('\t')
+            values.setdefault(field, []).append(value)
+    return values
+
+
 @pytest.fixture(scope="session")
 def expanded_data(normalized_data):
     return process.expand_delimiters(normalized_data)
 
 
+@pytest.fixture
+def sorted_fixture_dir(fixture_files, tmpdir):
+    """Fixtures are excerpts, sort their lines by codepoint like UNIHAN's."""
+    sorted_dir = tmpdir.mkdir('sorted')
+    for path in fixture_files:
+        with io.open(path, encoding='utf-8') as f:
+            lines = [line for line in f if line[0] != '#' and line != '\n']
+        lines.sort(key=lambda line: int(line.split('\t')[0][2:], 16))
+        sorted_dir.join(os.path.basename(path)).write_text(''.join(lines), 'utf-8')
+    return sorted_dir
+
+
 @pytest.fixture(scope="session")
 def sample_data():
     return """\
@@ -107,3 +138,73 @@ U+3401	kCantonese	tim2
 U+3401	kDefinition	to lick; to taste, a mat, bamboo bark
 U+3401	kHanyuPinyin	10019.020:tiàn
 """
+
+
+class UnihanRequestHandler(BaseHTTPRequestHandler):
+    """Serve ``server.payload`` at any path, like unicode.org serves Unihan.zip.
+
+    Supports ``ETag`` / ``Last-Modified`` revalidation and ``Range`` requests.
+    ``server.truncate`` cuts the next response short after that many bytes,
+    every response with ``server.truncate_all``.
+    """
+
+    def do_GET(self):
+        server = self.server
+        payload = server.payload
+        etag = '"%s"' % hashlib.sha256(payload).hexdigest()[:16]
+        server.requests.append(dict(self.headers.items()))
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        start = 0
+        range_ = self.headers.get('Range')
+        if range_ and self.headers.get('If-Range', etag) == etag:
+            start = int(range_.split('=')[1].rstrip('-'))
+            if start >= len(payload):
+                self.send_response(416)
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header(
+                'Content-Range',
+                'bytes %i-%i/%i' % (start, len(payload) - 1, len(payload)),
+            )
+        else:
+            self.send_response(200)
+        body = payload[start:]
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', etag)
+        self.send_header('Last-Modified', 'Tue, 05 Jun 2018 00:00:00 GMT')
+        self.end_headers()
+
+        if server.truncate is not None:
+            body = body[: server.truncate]
+            if not server.truncate_all:
+                server.truncate = None
+        self.wfile.write(body)
+        server.sent += len(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def unihan_server(mock_zip, mock_zip_file):
+    """Local HTTP server standing in for unicode.org, serving the mock zip."""
+    server = HTTPServer(('127.0.0.1', 0), UnihanRequestHandler)
+    server.payload = mock_zip_file.read_binary()
+    server.truncate = None
+    server.truncate_all = False
+    server.requests = []
+    server.sent = 0
+    server.url = 'http://127.0.0.1:%i/Public/UNIDATA/Unihan.zip' % server.server_port
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
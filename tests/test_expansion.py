@@ -2,9 +2,11 @@
 """Test expansion of multi-value fields in UNIHAN."""
 from __future__ import absolute_import, unicode_literals
 
+import collections
+
 import pytest
 
-from unihan_etl import constants, expansion
+from unihan_etl import constants, expansion, process
 
 
 def test_expands_spaces(expanded_data):
@@ -23,6 +25,82 @@ def test_expand_kCantonese(expanded_data):
         assert False, "Missing field U+342B kCantonese"
 
 
+def test_expand_delimiters_jobs(columns, fixture_files):
+    def normalized():
+        return process.normalize(process.load_data(files=fixture_files), columns)
+
+    expected = process.expand_delimiters(normalized())
+    result = process.expand_delimiters(normalized(), jobs=2)
+
+    assert result == expected
+
+
+def test_expand_delimiters_cache(columns, fixture_files):
+    def normalized():
+        return process.normalize(process.load_data(files=fixture_files), columns)
+
+    cache = expansion.ExpansionCache()
+    result = process.expand_delimiters(normalized(), cache=cache)
+
+    assert result == process.expand_delimiters(normalized())
+    assert cache.hits['kTotalStrokes'] > 0
+    stats = cache.stats()
+    assert sum(s['misses'] for s in stats.values()) == len(cache)
+
+
+def test_expansion_cache():
+    cache = expansion.ExpansionCache(maxsize=2)
+
+    pinyin = '10093.130:xī,lǔ 74609.020:lǔ,xī'
+    value = cache.expand_field('kHanyuPinyin', pinyin)
+    value[0]['readings'].append('lü')  # a copy, the cache is unchanged
+    assert cache.expand_field('kHanyuPinyin', pinyin) == expansion.expand_field(
+        'kHanyuPinyin', pinyin
+    )
+    assert cache.hits['kHanyuPinyin'] == 1
+    assert cache.misses['kHanyuPinyin'] == 1
+
+    cache.expand_field('kMandarin', 'qiū')
+    cache.expand_field('kHanyuPinyin', pinyin)  # most recently used
+    cache.expand_field('kDefinition', 'hillock')  # evicts kMandarin
+    assert len(cache) == 2
+    cache.expand_field('kMandarin', 'qiū')
+    assert cache.stats()['kMandarin'] == {'hits': 0, 'misses': 2}
+    assert cache.stats()['kHanyuPinyin'] == {'hits': 2, 'misses': 1}
+
+    # Fields without an expander aren't memoized
+    assert cache.expand_field('kCantonese', 'jau1 jau2') == ['jau1', 'jau2']
+
+
+def test_expansion_cache_custom_values(monkeypatch):
+    monkeypatch.setattr(expansion, 'EXPANDERS', dict(expansion.EXPANDERS))
+    Location = collections.namedtuple('Location', 'page character')
+
+    @expansion.register_expander('kDefinition')
+    def expand_kDefinition(value):
+        return [[Location(*value.split('.'))], {'sources': set(['G'])}]
+
+    cache = expansion.ExpansionCache()
+    value = cache.expand_field('kDefinition', '10.2')  # not marshallable
+    value[1]['sources'].add('T')
+    expected = [[Location('10', '2')], {'sources': set(['G'])}]
+    assert cache.expand_field('kDefinition', '10.2') == expected
+    assert cache.hits['kDefinition'] == 1
+    assert 'kCantonese' not in cache.stats()
+
+
+def test_export_expand_cache(fixture_dir):
+    options = {
+        'input_files': ['Unihan_Readings.txt'],
+        'work_dir': fixture_dir,
+        'format': 'python',
+    }
+    p = process.Packager(dict(options, expand_cache=1000))
+
+    assert p.export() == process.Packager(options).export()
+    assert p.expand_cache.hits['kMandarin'] > 0
+
+
 @pytest.mark.parametrize(
     "ucn,field,expected",
     [
@@ -874,3 +952,47 @@ def test_expand_kCCCII(expanded_data, ucn, fieldval, expected):
     assert item['kCCCII'] == expected
 
     assert expansion.expand_field('kCCCII', fieldval) == expected
+
+
+def test_expanders_registry():
+    assert expansion.EXPANDERS['kRSUnicode'] is expansion.expand_kRSUnicode
+    assert 'field' not in expansion.EXPANDERS
+    assert 'kCCCII' not in expansion.EXPANDERS
+
+
+def test_register_expander(monkeypatch):
+    monkeypatch.setattr(expansion, 'EXPANDERS', dict(expansion.EXPANDERS))
+
+    def expand_kCCCII(value):
+        return [int(v, 16) for v in value]
+
+    expansion.register_expander('kCCCII', expand_kCCCII)
+    assert expansion.expand_field('kCCCII', '213021 21302A') == [0x213021, 0x21302A]
+
+    @expansion.register_expander('kDefinition')
+    def expand_kDefinition(value):
+        return value.upper()
+
+    assert expand_kDefinition('hi') == 'HI'
+    assert expansion.expand_field('kDefinition', 'to lick') == 'TO LICK'
+
+
+@pytest.mark.parametrize(
+    "field",
+    [
+        "kHanYu",
+        "kHanyuPinyin",
+        "kXHC1983",
+        "kCheungBauer",
+        "kRSAdobe_Japan1_6",
+        "kRSUnicode",
+        "kGSR",
+        "kHDZRadBreak",
+    ],
+)
+def test_expand_field_benchmark(benchmark, field_values, field):
+    values = field_values[field]
+
+    result = benchmark(lambda: [expansion.expand_field(field, v) for v in values])
+
+    assert len(result) == len(values)
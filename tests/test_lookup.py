@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+from __future__ import absolute_import, unicode_literals
+
+import pytest
+
+from unihan_etl import lookup
+from unihan_etl.lookup import UnihanIndex
+from unihan_etl.process import Packager
+
+
+@pytest.fixture
+def index(sorted_fixture_dir):
+    return UnihanIndex.from_dir(str(sorted_fixture_dir))
+
+
+@pytest.mark.parametrize('char_or_ucn', ['U+3400', 'u+3400', '3400', '㐀', 0x3400])
+def test_to_codepoint(char_or_ucn):
+    assert lookup.to_codepoint(char_or_ucn) == 0x3400
+
+
+def test_lookup(index, sorted_fixture_dir):
+    items = Packager({'work_dir': str(sorted_fixture_dir), 'format': 'python'}).export()
+
+    for item in items:
+        assert index.lookup(item['ucn']) == item
+
+
+def test_lookup_fields(index):
+    char = index.lookup('㐀', fields=['kMandarin', 'kCantonese'])
+
+    assert char == {
+        'ucn': 'U+3400',
+        'char': '㐀',
+        'kCantonese': ['jau1'],
+        'kMandarin': {'zh-Hans': 'qiū', 'zh-Hant': 'qiū'},
+    }
+    assert index.lookup('U+3400', fields=['kMandarin'], expand=False) == {
+        'ucn': 'U+3400',
+        'char': '㐀',
+        'kMandarin': 'qiū',
+    }
+
+
+def test_lookup_missing(index):
+    assert index.lookup('a') is None
+    assert 'a' not in index
+    assert 'U+3400' in index
+    assert index.lookup('U+3400', fields=['kNotAField']) is None
+
+
+def test_lookup_work_dir(sorted_fixture_dir, monkeypatch):
+    monkeypatch.setattr(lookup, '_indexes', {})
+    work_dir = str(sorted_fixture_dir)
+
+    assert lookup.lookup('U+3401', ['kDefinition'], work_dir=work_dir) == {
+        'ucn': 'U+3401',
+        'char': '㐁',
+        'kDefinition': ['to lick', 'to taste, a mat, bamboo bark'],
+    }
+    assert list(lookup._indexes) == [work_dir]
+
+
+def test_lookup_last_codepoint(tmpdir):
+    tmpdir.join('Unihan_Readings.txt').write_binary(
+        '#\tUnihan_Readings.txt\n'
+        '#\n'
+        'U+3400\tkCantonese\tjau1\n'
+        'U+3401\tkCantonese\ttim2\n'
+        'U+3401\tkMandarin\ttiàn\n'
+        '\n'
+        '# EOF\n'.encode('utf-8')
+    )
+    index = UnihanIndex.from_dir(str(tmpdir))
+
+    assert index.lookup('U+3401') == {
+        'ucn': 'U+3401',
+        'char': '㐁',
+        'kCantonese': ['tim2'],
+        'kMandarin': {'zh-Hans': 'tiàn', 'zh-Hant': 'tiàn'},
+    }
+
+
+def test_lookup_files_changed(tmpdir):
+    readings = tmpdir.join('Unihan_Readings.txt')
+    readings.write_binary(
+        'U+3400\tkMandarin\tqiū\nU+3401\tkMandarin\ttiàn\n'.encode('utf-8')
+    )
+    index = UnihanIndex.from_dir(str(tmpdir))
+    tian = {'zh-Hans': 'tiàn', 'zh-Hant': 'tiàn'}
+    assert index.lookup('U+3401')['kMandarin'] == tian
+
+    readings.write_binary(  # extracted again, offsets moved
+        'U+3400\tkCantonese\tjau1\nU+3400\tkMandarin\tqiū\n'
+        'U+3401\tkMandarin\ttiàn\nU+3402\tkMandarin\txi\n'.encode('utf-8')
+    )
+    assert index.is_stale()
+    assert index.lookup('U+3401')['kMandarin'] == tian
+    assert index.lookup('U+3402')['ucn'] == 'U+3402'
+
+    index.offsets[0x3401] = index.offsets[0x3400]  # out of date, unnoticed
+    assert index.lookup('U+3401') is None  # rather than U+3400's data
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""Tests for timing and memory use of build stages."""
+from __future__ import absolute_import, unicode_literals
+
+import json
+
+import pytest
+
+from unihan_etl import stats
+from unihan_etl.stats import BuildStats
+
+
+def test_build_stats():
+    build_stats = BuildStats()
+    with build_stats.stage('normalize') as stage:
+        lines = list(stage.count_lines(['a', 'b', 'c']))
+        records = list(stage.count_records(iter(lines[:2])))
+
+    assert records == ['a', 'b']
+    assert 'normalize' in build_stats
+    stage = build_stats['normalize']
+    assert (stage.lines, stage.records) == (3, 2)
+    assert stage.wall >= 0 and stage.cpu >= 0
+    assert stage.traced_peak is None or stage.traced_peak >= 0
+
+    with pytest.raises(RuntimeError):
+        with build_stats.stage('expand'):
+            raise RuntimeError
+    assert build_stats['expand'].wall is not None  # measured on error too
+
+    with build_stats.stage('normalize'):
+        pass
+    assert list(build_stats.stages) == ['expand', 'normalize']
+    assert build_stats['normalize'].lines is None
+
+    result = json.loads(build_stats.to_json())
+    assert [s['name'] for s in result['stages']] == ['expand', 'normalize']
+    assert result['total']['wall'] == sum(s['wall'] for s in result['stages'])
+
+
+def test_max_rss(monkeypatch):
+    if stats.resource is not None:
+        assert stats.max_rss() > 0
+
+    monkeypatch.setattr(stats, 'resource', None)
+    assert stats.max_rss() is None
+    with BuildStats().stage('export') as stage:
+        pass
+    assert stage.max_rss is None
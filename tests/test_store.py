@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""Tests for columnar storage of normalized UNIHAN data."""
+from __future__ import absolute_import, unicode_literals
+
+import json
+
+import pytest
+
+from unihan_etl import expansion, process
+from unihan_etl.process import Packager
+from unihan_etl.store import ColumnStore, LazyColumnStore, LazyRow
+
+
+@pytest.fixture
+def store():
+    store = ColumnStore(['kCantonese', 'kMandarin'])
+    store.add('㐀', 'U+3400')
+    store.columns['kCantonese'][0] = 'jau1'
+    store.add('㐁', 'U+3401')
+    return store
+
+
+def test_row_is_dict_like(store):
+    assert len(store) == 2
+    assert store[0] == {
+        'kCantonese': 'jau1',
+        'kMandarin': None,
+        'ucn': 'U+3400',
+        'char': '㐀',
+    }
+    assert list(store[-1].keys()) == ['kCantonese', 'kMandarin', 'ucn', 'char']
+    assert store.get('㐁')['ucn'] == 'U+3401'
+    assert store.get('丘') is None
+
+    with pytest.raises(IndexError):
+        store[2]
+
+
+def test_row_copy(store):
+    copy = store[0].copy()
+    assert type(copy) is dict
+    assert json.loads(json.dumps(copy)) == store[0]
+
+    copy['kCantonese'] = 'jau2'
+    assert store[0]['kCantonese'] == 'jau1'
+
+
+def test_row_write_and_pop(store):
+    row = store[1]
+    row['kMandarin'] = {'zh-Hans': 'tiàn', 'zh-Hant': 'tiàn'}
+    assert store.columns['kMandarin'][1]['zh-Hans'] == 'tiàn'
+
+    assert row.pop('kCantonese', None) is None
+    assert 'kCantonese' not in row
+    assert 'kCantonese' in store[0]
+    with pytest.raises(KeyError):
+        del row['kCantonese']
+
+    row['kDefinition'] = ['to lick']
+    assert 'kDefinition' not in store[0]
+    assert row['kDefinition'] == ['to lick']
+
+
+def test_prune(store):
+    store.prune()
+
+    assert store[0] == {'kCantonese': 'jau1', 'ucn': 'U+3400', 'char': '㐀'}
+    assert store[1] == {'ucn': 'U+3401', 'char': '㐁'}
+
+
+def test_normalize_returns_store(normalized_data, columns):
+    assert isinstance(normalized_data, ColumnStore)
+    assert set(normalized_data.fields) == set(columns)
+    assert normalized_data.get('㐀')['ucn'] == 'U+3400'
+
+
+def test_export_json(store, tmpdir):
+    destination = str(tmpdir.join('unihan.json'))
+
+    process.export_json(store, destination)
+
+    with open(destination) as f:
+        assert json.load(f) == [dict(row) for row in store]
+
+
+def test_lazy_store(store, monkeypatch):
+    calls = []
+    expand_field = expansion.expand_field
+
+    def counting_expand_field(field, value):
+        calls.append(field)
+        return expand_field(field, value)
+
+    monkeypatch.setattr(expansion, 'expand_field', counting_expand_field)
+    lazy = LazyColumnStore.from_store(store)
+    row = lazy[0]
+
+    assert isinstance(row, LazyRow)
+    assert calls == []
+    assert row['kCantonese'] == ['jau1']
+    assert lazy.get('㐀')['kCantonese'] == ['jau1']
+    assert calls == ['kCantonese']  # memoized
+    assert row['kMandarin'] is None
+
+    row['kCantonese'] = ['jau1', 'jau2']
+    assert row['kCantonese'] == ['jau1', 'jau2']
+    assert calls == ['kCantonese']
+    assert lazy.expanded['kCantonese'] == bytearray([1, 0])
+
+    new_row = lazy.add('㐂', 'U+3402')  # flags grow with the store
+    lazy.columns['kCantonese'][new_row] = 'jau2'
+    assert lazy[new_row]['kCantonese'] == ['jau2']
+    assert lazy.expanded['kCantonese'] == bytearray([1, 0, 1])
+
+
+def test_export_lazy(fixture_dir):
+    options = {
+        'input_files': ['Unihan_Readings.txt', 'Unihan_Variants.txt'],
+        'work_dir': fixture_dir,
+        'format': 'python',
+    }
+
+    items = Packager(dict(options, lazy=True)).export()
+
+    assert isinstance(items, LazyColumnStore)
+    assert items == Packager(options).export()
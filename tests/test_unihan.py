@@ -2,14 +2,21 @@
 """Tests for unihan data download and processing."""
 from __future__ import absolute_import, unicode_literals
 
+import hashlib
+import json
 import logging
 import os
+import pickle
 import shutil
+import sqlite3
+import types
+import zipfile
 
 import pytest
 
 from unihan_etl import constants, process, __version__
 from unihan_etl.process import DEFAULT_OPTIONS, UNIHAN_ZIP_PATH, Packager, zip_has_files
+from unihan_etl.store import ColumnStore
 from unihan_etl.test import assert_dict_contains_subset
 from unihan_etl.util import merge_dict
 
@@ -68,6 +75,11 @@ def test_get_files():
     assert set(result) == set(expected)
 
 
+def test_unihan_field_files():
+    assert constants.UNIHAN_FIELD_FILES['kDefinition'] == 'Unihan_Readings.txt'
+    assert set(constants.UNIHAN_FIELD_FILES) == set(process.UNIHAN_FIELDS)
+
+
 def test_download(tmpdir, mock_zip, mock_zip_file, mock_zip_filename):
     dest_filepath = tmpdir.join('data', mock_zip_filename)
 
@@ -77,6 +89,146 @@ def test_download(tmpdir, mock_zip, mock_zip_file, mock_zip_filename):
     assert result, "Creates data directory if doesn't exist."
 
 
+def test_fetch(tmpdir, unihan_server):
+    dest = tmpdir.join('Unihan.zip')
+
+    assert process.fetch(unihan_server.url, str(dest))
+    assert dest.read_binary() == unihan_server.payload
+    assert 'etag' in json.loads(tmpdir.join('Unihan.zip.headers.json').read())
+
+    # Unchanged: revalidated, nothing transferred
+    sent = unihan_server.sent
+    assert not process.fetch(unihan_server.url, str(dest))
+    assert unihan_server.sent == sent
+    assert 'If-None-Match' in unihan_server.requests[-1]
+    assert 'If-Modified-Since' in unihan_server.requests[-1]
+
+    # Changed upstream
+    unihan_server.payload += b'\0'
+    assert process.fetch(unihan_server.url, str(dest))
+    assert dest.read_binary() == unihan_server.payload
+
+
+def test_fetch_resume(tmpdir, unihan_server):
+    dest = tmpdir.join('Unihan.zip')
+    unihan_server.truncate = 100
+
+    assert not process.fetch(unihan_server.url, str(dest))
+    assert not dest.exists()
+    assert tmpdir.join('Unihan.zip.part').size() == 100
+
+    assert process.fetch(unihan_server.url, str(dest))
+    assert unihan_server.requests[-1]['Range'] == 'bytes=100-'
+    assert unihan_server.sent == len(unihan_server.payload)
+    assert dest.read_binary() == unihan_server.payload
+    assert not tmpdir.join('Unihan.zip.part').exists()
+
+
+def test_fetch_write_error(tmpdir, unihan_server, monkeypatch):
+    def save_validators(path, headers):
+        raise IOError(28, 'No space left on device')
+
+    monkeypatch.setattr(process, '_save_validators', save_validators)
+    with pytest.raises(IOError) as excinfo:
+        process.fetch(unihan_server.url, str(tmpdir.join('Unihan.zip')))
+    excinfo.match('No space left')
+
+
+def test_fetch_resume_changed(tmpdir, unihan_server):
+    dest = tmpdir.join('Unihan.zip')
+    unihan_server.truncate = 100
+    process.fetch(unihan_server.url, str(dest))
+
+    # Partial file is of an older zip, whole file is sent again
+    unihan_server.payload += b'\0'
+    assert process.fetch(unihan_server.url, str(dest))
+    assert dest.read_binary() == unihan_server.payload
+
+
+def test_fetch_sha256(tmpdir, unihan_server):
+    dest = tmpdir.join('Unihan.zip')
+    sha256 = hashlib.sha256(unihan_server.payload).hexdigest()
+
+    with pytest.raises(ValueError) as excinfo:
+        process.fetch(unihan_server.url, str(dest), sha256='0' * 64)
+    excinfo.match('expected 0+')
+    assert not tmpdir.listdir()
+
+    assert process.fetch(unihan_server.url, str(dest), sha256=sha256.upper())
+
+
+def test_download_refresh(tmpdir, unihan_server):
+    options = {
+        'source': unihan_server.url,
+        'zip_path': str(tmpdir.join('downloads', 'Unihan.zip')),
+        'work_dir': str(tmpdir.join('downloads')),
+        'input_files': ['Unihan_Readings.txt'],
+        'refresh': True,
+    }
+    Packager(options).download()
+    assert tmpdir.join('downloads', 'Unihan_Readings.txt').exists()
+    sent = unihan_server.sent
+
+    Packager(options).download()
+    assert unihan_server.sent == sent
+    assert len(unihan_server.requests) == 2
+
+
+@pytest.mark.parametrize('refresh', [False, True])
+def test_download_truncated_zip(tmpdir, unihan_server, refresh):
+    downloads = tmpdir.mkdir('downloads')  # zip and extracted files, as default
+    downloads.join('Unihan_Readings.txt').write('')
+    downloads.join('Unihan.zip').write_binary(unihan_server.payload[:100])
+    options = {
+        'source': unihan_server.url,
+        'zip_path': str(downloads.join('Unihan.zip')),
+        'work_dir': str(downloads),
+        'input_files': ['Unihan_Readings.txt'],
+        'refresh': refresh,
+    }
+    Packager(options).download()
+
+    assert downloads.join('Unihan.zip').read_binary() == unihan_server.payload
+    assert unihan_server.requests[-1]['Range'] == 'bytes=100-'  # resumed
+    assert downloads.join('Unihan_Readings.txt').size()
+
+
+def test_download_no_progress(tmpdir, unihan_server):
+    unihan_server.truncate = 0  # connection closed before any of the body
+    unihan_server.truncate_all = True
+    options = {
+        'source': unihan_server.url,
+        'zip_path': str(tmpdir.join('downloads', 'Unihan.zip')),
+        'work_dir': str(tmpdir.join('downloads')),
+        'input_files': ['Unihan_Readings.txt'],
+    }
+    with pytest.raises(IOError) as excinfo:
+        Packager(options).download()
+    excinfo.match('made no progress')
+    assert len(unihan_server.requests) == 1
+
+    unihan_server.truncate = 100  # resumed 100 bytes at a time
+    Packager(options).download()
+    assert tmpdir.join('downloads', 'Unihan.zip').read_binary() == unihan_server.payload
+
+
+def test_download_stats_stdout(tmpdir, unihan_server, capsys):
+    options = {
+        'source': unihan_server.url,
+        'zip_path': str(tmpdir.join('downloads', 'Unihan.zip')),
+        'work_dir': str(tmpdir.join('downloads')),
+        'input_files': ['Unihan_Readings.txt'],
+    }
+    Packager(options).download()
+    assert '100%' in capsys.readouterr().out
+
+    tmpdir.join('downloads').remove()
+    Packager(dict(options, stats='json')).download()  # stdout kept for stats
+    captured = capsys.readouterr()
+    assert captured.out == ''
+    assert '100%' in captured.err
+
+
 def test_download_mock(tmpdir, mock_zip, mock_zip_file, mock_test_dir, test_options):
     data_path = tmpdir.join('data')
     dest_path = data_path.join('data', 'hey.zip')
@@ -134,6 +286,493 @@ def test_extract_zip(mock_zip, mock_zip_file, tmpdir):
     assert zf.infolist()[0].filename == "Unihan_Readings.txt"
 
 
+@pytest.mark.parametrize('fields', [['kDefinition', 'kMandarin'], None])
+def test_load_mmap_data(fixture_files, fields):
+    fields = fields or process.UNIHAN_FIELDS
+    lines = list(process.load_mmap_data(fixture_files, fields))
+
+    assert all(line.split('\t')[1] in fields for line in lines)
+    assert process.normalize(lines, fields) == process.normalize(
+        process.load_data(files=fixture_files), fields
+    )
+
+
+def test_export_mmap(fixture_dir):
+    options = {
+        'input_files': ['Unihan_Readings.txt', 'Unihan_Variants.txt'],
+        'fields': ['kDefinition', 'kSemanticVariant'],
+        'work_dir': fixture_dir,
+        'format': 'python',
+    }
+    expected = Packager(options).export()
+
+    assert Packager(dict(options, mmap=True)).export() == expected
+    assert Packager(dict(options, mmap=True, jobs=2)).export() == expected
+
+
+def test_extract_zip_members(fixture_files, tmpdir, monkeypatch):
+    zip_path = str(tmpdir.join('Unihan.zip'))
+    with zipfile.ZipFile(zip_path, 'w') as zf:
+        for path in fixture_files:
+            zf.write(path, os.path.basename(path))
+    dest = tmpdir.join('extracted')
+
+    zf = process.extract_zip(zip_path, str(dest), members=['Unihan_Readings.txt'])
+    assert zf.fp is None  # closed
+    assert dest.listdir() == [dest.join('Unihan_Readings.txt')]
+
+    extracted = []
+    original = zipfile.ZipFile.extract
+
+    def extract(self, member, *args, **kwargs):
+        extracted.append(member.filename)
+        return original(self, member, *args, **kwargs)
+
+    monkeypatch.setattr(zipfile.ZipFile, 'extract', extract)
+
+    # Same size, different contents
+    readings = dest.join('Unihan_Readings.txt')
+    readings.write_binary(b'#' * readings.size())
+    process.extract_zip(zip_path, str(dest), members=['Unihan_Readings.txt'])
+    assert extracted == ['Unihan_Readings.txt']
+    assert 'kDefinition' in readings.read_text('utf-8')
+
+    process.extract_zip(zip_path, str(dest))
+    assert len(extracted) == len(fixture_files)  # Unihan_Readings.txt skipped
+
+
+def test_load_data_from_zip(mock_zip, mock_zip_file, sample_data):
+    data = process.load_data(files=['Unihan_Readings.txt'], zip_path=str(mock_zip_file))
+
+    assert ''.join(data) == sample_data
+
+
+def test_export_no_extract(mock_zip, mock_zip_file, tmpdir):
+    p = Packager(
+        {
+            'input_files': ['Unihan_Readings.txt'],
+            'zip_path': str(mock_zip_file),
+            'work_dir': str(tmpdir.join('downloads')),
+            'destination': str(tmpdir.join('unihan.{ext}')),
+            'format': 'python',
+            'extract': False,
+        }
+    )
+    p.download()
+    assert not tmpdir.join('downloads', 'Unihan_Readings.txt').exists()
+
+    items = p.export()
+    assert [i['ucn'] for i in items] == ['U+3400', 'U+3401']
+    assert items[0]['kMandarin'] == {'zh-Hans': 'qiū', 'zh-Hant': 'qiū'}
+
+
+def test_export_pickle(mock_zip, mock_zip_file, tmpdir):
+    options = {
+        'input_files': ['Unihan_Readings.txt'],
+        'zip_path': str(mock_zip_file),
+        'work_dir': str(tmpdir.join('downloads')),
+        'destination': str(tmpdir.join('unihan.{ext}')),
+        'format': 'pickle',
+    }
+    p = Packager(dict(options))
+    p.download()
+    p.export()
+
+    result = process.load_pickle(str(tmpdir.join('unihan.pickle')))
+    assert result == Packager(dict(options, format='python')).export()
+    assert result[1]['kHanyuPinyin'][0]['readings'] == ['tiàn']
+
+    Packager(dict(options, stream=True)).export()
+    streamed = process.load_pickle(str(tmpdir.join('unihan.pickle')))
+    assert isinstance(streamed, ColumnStore)
+    assert streamed == result
+    assert 'kHanyuPinyin' not in streamed[0]  # pruned, not None
+
+    old_snapshot = tmpdir.join('old.pickle')
+    with open(str(old_snapshot), 'wb') as f:
+        pickle.dump((process.PICKLE_VERSION - 1, []), f)
+    with pytest.raises(ValueError):
+        process.load_pickle(str(old_snapshot))
+
+
+@pytest.mark.parametrize('backend', ['json', 'orjson', 'ujson'])
+@pytest.mark.parametrize('compact', [False, True])
+def test_export_json(tmpdir, expanded_data, backend, compact):
+    if backend != 'json':
+        pytest.importorskip(backend)
+    destination = tmpdir.join('unihan.json')
+    expected = [dict(char) for char in expanded_data]
+
+    process.export_json(
+        iter(expanded_data), str(destination), compact=compact, backend=backend
+    )
+
+    if compact:
+        expected = json.dumps(expected, ensure_ascii=False, separators=(',', ':'))
+    else:
+        expected = json.dumps(expected, ensure_ascii=False, indent=2)
+    assert destination.read_text('utf-8') == expected
+
+    process.export_json([], str(destination), compact=compact, backend=backend)
+    assert destination.read_text('utf-8') == '[]'
+
+
+def test_export_ndjson(tmpdir, expanded_data):
+    destination = str(tmpdir.join('unihan.ndjson'))
+
+    assert process.export_ndjson(expanded_data, destination) == [destination]
+    with open(destination) as f:
+        assert [json.loads(line) for line in f] == [dict(c) for c in expanded_data]
+
+    paths = process.export_ndjson(expanded_data, destination, shards=3)
+    assert paths == [
+        str(tmpdir.join('unihan-0000%i-of-00003.ndjson' % i)) for i in range(1, 4)
+    ]
+
+    shards = []
+    for path in paths:
+        with open(path) as f:
+            shards.append([json.loads(line) for line in f])
+    assert sorted(sum(shards, []), key=lambda c: c['ucn']) == sorted(
+        [dict(c) for c in expanded_data], key=lambda c: c['ucn']
+    )
+    for shard, next_shard in zip(shards, shards[1:]):
+        assert max(ord(c['char']) for c in shard) < min(
+            ord(c['char']) for c in next_shard
+        )
+    assert abs(len(shards[0]) - len(shards[-1])) <= 1
+
+    assert process.export_ndjson([], destination, shards=2) == process.get_shard_paths(
+        destination, 2
+    )
+
+
+@pytest.mark.parametrize('format_', ['parquet', 'arrow'])
+def test_export_arrow(tmpdir, expanded_data, format_):
+    pyarrow = pytest.importorskip('pyarrow')
+    import pyarrow.parquet
+
+    fields = constants.INDEX_FIELDS + ('kTotalStrokes', 'kRSUnicode', 'kDefinition')
+    destination = str(tmpdir.join('unihan.%s' % format_))
+
+    if format_ == 'parquet':
+        process.export_parquet(expanded_data, destination, fields)
+        table = pyarrow.parquet.read_table(destination)
+    else:
+        process.export_arrow(expanded_data, destination, fields)
+        table = pyarrow.ipc.open_file(destination).read_all()
+
+    assert table.column_names == list(fields)
+    assert table.schema.field('kTotalStrokes').type == pyarrow.struct(
+        [('zh-Hans', pyarrow.int64()), ('zh-Hant', pyarrow.int64())]
+    )
+    assert table.schema.field('kDefinition').type == pyarrow.list_(pyarrow.string())
+    assert table.to_pylist() == [
+        {field: char.get(field) for field in fields} for char in expanded_data
+    ]
+
+
+def test_arrow_table_mixed_types():
+    pytest.importorskip('pyarrow')
+
+    table = process._arrow_table(
+        [{'char': 'a', 'kMixed': ['x']}, {'char': 'b', 'kMixed': {'y': 1}}],
+        ['char', 'kMixed'],
+    )
+
+    assert table.column('kMixed').to_pylist() == ['["x"]', '{"y": 1}']
+
+
+def test_export_sqlite(tmpdir, fixture_files):
+    fields = constants.INDEX_FIELDS + (
+        'kCantonese',
+        'kMandarin',
+        'kRSUnicode',
+        'kHanyuPinyin',
+        'kHDZRadBreak',
+    )
+    data = process.normalize(process.load_data(files=fixture_files), fields)
+    data = process.expand_delimiters(data)
+    destination = str(tmpdir.join('unihan.sqlite'))
+
+    process.export_sqlite(data, destination, fields)
+
+    conn = sqlite3.connect(destination)
+    assert conn.execute(
+        'SELECT ucn, kMandarin, "kMandarin_zh-Hans", "kMandarin_zh-Hant" '
+        'FROM unihan WHERE char = ?',
+        ('\u4ffe',),
+    ).fetchone() == ('U+4FFE', None, 'bǐ', 'bì')
+    assert conn.execute(
+        'SELECT value FROM kCantonese WHERE char = ? ORDER BY seq', ('\u342b',)
+    ).fetchall() == [('gun3',), ('hung1',), ('zung1',)]
+    assert conn.execute(
+        'SELECT radical, strokes, simplified FROM kRSUnicode WHERE char = ?',
+        ('\u3400',),
+    ).fetchall() == [(1, 4, 0)]
+    assert conn.execute(
+        'SELECT value FROM kHanyuPinyin_readings WHERE char = ? ORDER BY seq, seq2',
+        ('\u3401',),
+    ).fetchall() == [('tiàn',)]
+    assert conn.execute(
+        'SELECT volume, page, character, virtual FROM kHanyuPinyin_locations '
+        'WHERE char = ? ORDER BY seq, seq2',
+        ('\u3401',),
+    ).fetchall() == [(1, 19, 2, 0)]
+    assert conn.execute(
+        'SELECT kHDZRadBreak_radical, kHDZRadBreak_location_page FROM unihan '
+        'WHERE kHDZRadBreak_radical IS NOT NULL'
+    ).fetchall()
+    indexes = {
+        r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")
+    }
+    assert {
+        'unihan_ucn',
+        'unihan_kMandarin_zh-Hans',
+        'kCantonese_value',
+        'kRSUnicode_radical',
+        'kRSUnicode_strokes',
+        'kHanyuPinyin_readings_value',
+    } <= indexes
+    assert conn.execute(
+        'SELECT kCantonese FROM unihan WHERE char = ?', ('\u342b',)
+    ).fetchone() == (None,)
+    plan = conn.execute(
+        'EXPLAIN QUERY PLAN SELECT char FROM kRSUnicode WHERE strokes = 4'
+    ).fetchall()
+    assert 'kRSUnicode_strokes' in str(plan)
+    conn.close()
+
+    process.export_sqlite(data, destination, fields, batch_size=2)
+    conn = sqlite3.connect(destination)
+    assert conn.execute('SELECT count(*) FROM unihan').fetchone() == (len(data),)
+    assert conn.execute(
+        'SELECT value FROM kCantonese WHERE char = ? ORDER BY seq', ('\u342b',)
+    ).fetchall() == [('gun3',), ('hung1',), ('zung1',)]
+    conn.close()
+
+    process.export_sqlite(data[:1], destination, ('kCantonese',))
+    conn = sqlite3.connect(destination)
+    assert conn.execute('SELECT count(*) FROM unihan').fetchone() == (1,)
+    conn.close()
+
+
+@pytest.mark.parametrize('format_', ['json', 'csv', 'ndjson', 'yaml', 'sqlite'])
+def test_export_stream(mock_zip, mock_zip_file, tmpdir, format_):
+    if format_ == 'yaml':
+        pytest.importorskip('yaml')
+
+    def export(**options):
+        p = Packager(
+            dict(
+                {
+                    'input_files': ['Unihan_Readings.txt'],
+                    'zip_path': str(mock_zip_file),
+                    'destination': str(tmpdir.join('unihan.{ext}')),
+                    'format': format_,
+                    'extract': False,
+                },
+                **options
+            )
+        )
+        p.export()
+        destination = p.options['destination']
+        if format_ == 'sqlite':
+            conn = sqlite3.connect(destination)
+            result = list(conn.iterdump())
+            conn.close()
+            return result
+        with open(destination, 'rb') as f:
+            return f.read()
+
+    assert export(stream=True) == export()
+
+
+def test_export_stream_python(mock_zip, mock_zip_file, tmpdir):
+    options = {
+        'input_files': ['Unihan_Readings.txt'],
+        'zip_path': str(mock_zip_file),
+        'format': 'python',
+        'extract': False,
+    }
+
+    result = Packager(dict(options, stream=True)).export()
+
+    assert isinstance(result, types.GeneratorType)
+    assert list(result) == Packager(options).export()
+
+
+def test_expand_records(fixture_files, columns):
+    def records():
+        return process.iter_records(process.load_data(files=fixture_files), columns)
+
+    expected = [process.expand_record(char) for char in records()]
+
+    assert list(process.expand_records(records())) == expected
+    assert list(process.expand_records(records(), jobs=2, chunk_size=50)) == expected
+
+
+def test_normalize_files(fixture_files, columns, mock_zip, mock_zip_file):
+    expected = process.normalize(process.load_data(files=fixture_files), columns)
+
+    assert process.normalize_files(fixture_files, columns, jobs=2) == expected
+    assert list(process.normalize_files(fixture_files, columns)[0]) == list(expected[0])
+
+    files = ['Unihan_Readings.txt']
+    assert process.normalize_files(
+        files, columns, jobs=2, zip_path=str(mock_zip_file)
+    ) == process.normalize(process.load_data(files, str(mock_zip_file)), columns)
+
+
+def test_export_jobs(fixture_dir):
+    options = {
+        'input_files': ['Unihan_Readings.txt', 'Unihan_Variants.txt'],
+        'work_dir': fixture_dir,
+        'format': 'python',
+    }
+
+    assert Packager(dict(options, jobs=2)).export() == Packager(options).export()
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_export_intern(fixture_dir, jobs):
+    options = {
+        'input_files': ['Unihan_Readings.txt', 'Unihan_Variants.txt'],
+        'work_dir': fixture_dir,
+        'format': 'python',
+        'jobs': jobs,
+    }
+    p = Packager(dict(options, intern=True))
+    items = p.export()
+
+    assert items == Packager(options).export()
+    assert p.value_pool.saved > 0
+    readings = [r for c in items for r in c.get('kCantonese', []) if r == 'zyu5']
+    assert len(readings) == 3
+    assert all(r is readings[0] for r in readings)
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_export_stats(fixture_dir, fixture_files, tmpdir, stream):
+    p = Packager(
+        {
+            'input_files': ['Unihan_Readings.txt', 'Unihan_Variants.txt'],
+            'work_dir': fixture_dir,
+            'destination': str(tmpdir.join('unihan.json')),
+            'format': 'json',
+            'stream': stream,
+        }
+    )
+    p.export()
+
+    files = [f for f in fixture_files if 'Readings' in f or 'Variants' in f]
+    lines = len(list(process.load_data(files=files)))
+    items = len(json.loads(tmpdir.join('unihan.json').read()))
+    if stream:
+        assert list(p.stats.stages) == ['export']
+        assert p.stats['export'].lines == lines
+    else:
+        assert list(p.stats.stages) == ['normalize', 'expand', 'prune', 'export']
+        assert p.stats['normalize'].lines == lines
+        assert p.stats['normalize'].records == items
+    assert p.stats['export'].records == items
+
+    result = json.loads(p.stats.to_json())
+    assert result['total']['wall'] > 0
+
+
+def test_merge_records(fixture_files, sorted_fixture_dir, columns):
+    files = [str(sorted_fixture_dir.join(os.path.basename(f))) for f in fixture_files]
+    streams = [process.load_data(files=[f]) for f in files]
+    records = list(process.merge_records(streams, columns))
+
+    expected = process.iter_records(process.load_data(files=files), columns)
+    assert records == sorted(expected, key=lambda char: ord(char['char']))
+    assert list(records[0]) == process.normalize([], columns).fields
+
+
+def test_merge_records_unsorted(fixture_files, columns):
+    streams = [process.load_data(files=[f]) for f in fixture_files]
+
+    with pytest.raises(ValueError) as excinfo:
+        list(process.merge_records(streams, columns))
+    excinfo.match('out of codepoint order')
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_export_merge_kway(sorted_fixture_dir, stream):
+    options = {
+        'input_files': ['Unihan_Readings.txt', 'Unihan_Variants.txt'],
+        'work_dir': str(sorted_fixture_dir),
+        'format': 'python',
+        'stream': stream,
+    }
+
+    result = list(Packager(dict(options, merge='kway')).export())
+
+    expected = list(Packager(options).export())
+    assert result == sorted(expected, key=lambda char: ord(char['char']))
+
+
+def test_export_cache(mock_zip, mock_zip_file, tmpdir, monkeypatch):
+    options = {
+        'input_files': ['Unihan_Readings.txt'],
+        'zip_path': str(mock_zip_file),
+        'work_dir': str(tmpdir.join('downloads')),
+        'destination': str(tmpdir.join('unihan.{ext}')),
+        'format': 'json',
+        'cache': True,
+        'cache_dir': str(tmpdir.join('builds')),
+    }
+    p = Packager(dict(options))
+    p.download()
+    p.export()
+    assert len(tmpdir.join('builds').listdir()) == 2  # build + json export record
+    destination = tmpdir.join('unihan.json')
+    expected = destination.read_text('utf-8')
+
+    def normalize(*args, **kwargs):
+        raise AssertionError('Build is cached')
+
+    monkeypatch.setattr(process, 'normalize', normalize)
+    monkeypatch.setattr(process, 'export_json', normalize)
+    Packager(dict(options)).export()  # destination is up to date
+
+    monkeypatch.undo()
+    monkeypatch.setattr(process, 'normalize', normalize)
+    destination.write('[]')
+    Packager(dict(options)).export()
+    assert destination.read_text('utf-8') == expected
+
+    Packager(dict(options, compact=True)).export()  # output options changed
+    assert destination.read_text('utf-8') != expected
+    assert json.loads(destination.read_text('utf-8')) == json.loads(expected)
+
+    items = Packager(dict(options, format='python')).export()
+    assert [i['ucn'] for i in items] == ['U+3400', 'U+3401']
+    assert 'kHanyuPinyin' not in items[0]  # pruned
+
+    with pytest.raises(AssertionError):
+        Packager(dict(options, format='python', prune_empty=False)).export()
+
+
+def test_save_build_cache_prunes(tmpdir):
+    builds = tmpdir.mkdir('builds')
+    for age, key in enumerate(['new', 'old', 'older']):
+        process.save_build_cache([], str(builds.join(key + '.pickle')), keep=3)
+        builds.join(key + '.json.json').write('{}')
+        mtime = 1000000000 - age * 60
+        os.utime(str(builds.join(key + '.pickle')), (mtime, mtime))
+    assert process.load_build_cache(str(builds.join('older.pickle'))) == []
+
+    process.save_build_cache([], str(builds.join('latest.pickle')), keep=2)
+    assert sorted(f.basename for f in builds.listdir()) == [
+        'latest.pickle',
+        'older.json.json',
+        'older.pickle',  # loaded last
+    ]
+
+
 def test_normalize_only_output_requested_columns(normalized_data, columns):
     items = normalized_data
     in_columns = ['kDefinition', 'kCantonese']
@@ -183,6 +822,48 @@ def test_normalize_simple_data_format(fixture_dir):
     rows = items[1:]  # NOQA
 
 
+@pytest.mark.parametrize(
+    "fields",
+    [
+        process.UNIHAN_FIELDS,
+        ('kDefinition', 'kMandarin'),
+    ],
+    ids=['all', 'narrow'],
+)
+def test_normalize_benchmark(benchmark, fixture_files, fields):
+    lines = list(process.load_data(files=fixture_files))
+    columns = constants.INDEX_FIELDS + fields
+
+    items = benchmark(process.normalize, lines, columns)
+
+    assert set(items.fields) == set(columns)
+    assert items.get('\u3400')['ucn'] == 'U+3400'
+
+
+@pytest.mark.parametrize(
+    'fields',
+    [
+        process.UNIHAN_FIELDS,
+        ('kDefinition', 'kMandarin'),
+    ],
+    ids=['all', 'narrow'],
+)
+@pytest.mark.parametrize('loader', ['fileinput', 'mmap'])
+def test_load_benchmark(benchmark, fixture_files, fields, loader):
+    columns = constants.INDEX_FIELDS + fields
+
+    def load():
+        if loader == 'mmap':
+            raw_data = process.load_mmap_data(fixture_files, columns)
+        else:
+            raw_data = process.load_data(files=fixture_files)
+        return process.normalize(raw_data, columns)
+
+    items = benchmark(load)
+
+    assert items.get('\u3400')['ucn'] == 'U+3400'
+
+
 def test_flatten_fields():
 
     single_dataset = {'Unihan_Readings.txt': ['kCantonese', 'kDefinition', 'kHangul']}
@@ -280,6 +961,18 @@ def test_set_reduce_files_automatically_when_only_field_specified():
     assert set(expected) == set(results)
 
 
+def test_reduce_files_to_fields_picked():
+    """Only opens files holding the fields picked."""
+
+    files = ['Unihan_Readings.txt', 'Unihan_Variants.txt']
+
+    options = {'input_files': files, 'fields': ['kDefinition', 'kMandarin']}
+
+    b = process.Packager(options)
+
+    assert b.options['input_files'] == ['Unihan_Readings.txt']
+
+
 def test_set_reduce_fields_automatically_when_only_files_specified():
     """Picks only necessary files when fields specified."""
 
@@ -330,6 +1023,12 @@ def test_cli_plus_defaults(mock_zip_file):
     option_subset = {'format': 'json'}
     assert_dict_contains_subset(option_subset, result, msg="format argument works")
 
+    result = Packager.from_cli(['--stats', 'json']).options
+    assert_dict_contains_subset({'stats': 'json'}, result, msg="stats argument works")
+
+    result = Packager.from_cli(['-j', '4']).options
+    assert_dict_contains_subset({'jobs': 4}, result, msg="jobs argument works")
+
 
 def test_cli_exit_emessage_to_stderr():
     """Sends exception .message to stderr on exit."""
@@ -341,6 +1040,18 @@ def test_cli_exit_emessage_to_stderr():
     excinfo.match('Field sdfa not found in file list.')
 
 
+def test_cli_negative_jobs():
+    with pytest.raises(SystemExit) as excinfo:
+        Packager.from_cli(['-j', '-3'])
+    excinfo.match('jobs must be 0')
+
+
+def test_cli_negative_expand_cache():
+    with pytest.raises(SystemExit) as excinfo:
+        Packager.from_cli(['--expand-cache', '-5'])
+    excinfo.match('expand_cache must be 0')
+
+
 @pytest.mark.parametrize('flag', ['-v', '--version'])
 def test_cli_version(capsys, flag):
     with pytest.raises(SystemExit):
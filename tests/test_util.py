@@ -2,7 +2,7 @@
 from __future__ import absolute_import, unicode_literals
 
 from unihan_etl._compat import text_type
-from unihan_etl.util import ucn_to_unicode, ucnstring_to_unicode
+from unihan_etl.util import ValuePool, ucn_to_unicode, ucnstring_to_unicode
 
 
 def test_conversion_ucn_to_unicode():
@@ -31,3 +31,39 @@ def test_conversion_ucn_to_unicode():
 
     assert result == expected
     assert isinstance(result, text_type)
+
+
+def test_ucn_to_unicode_cached():
+    assert ucn_to_unicode('U+20001') is ucn_to_unicode('U+20001')
+    assert ucn_to_unicode(0x4E00) == ucn_to_unicode('4E00') == '一'
+
+
+def test_ucn_to_unicode_benchmark(benchmark):
+    # normalize() sees each codepoint once per field, ~10 times on average
+    ucns = ['U+%X' % codepoint for codepoint in range(0x3400, 0x4400)] * 10
+
+    result = benchmark(lambda: [ucn_to_unicode(ucn) for ucn in ucns])
+
+    assert result[0] == '㐀'
+    assert result[-1] == '䏿'
+
+
+def test_value_pool():
+    pool = ValuePool()
+    a, b = ''.join(['G0', '-3021']), ''.join(['G0-', '3021'])
+    assert a is not b
+
+    assert pool.intern(a) is a
+    assert pool.intern(b) is a
+    assert pool.hits == 1
+    assert pool.saved > 0
+
+    value = pool.intern_value([{'readings': [''.join(['G0', '-3021'])], 'page': 1024}])
+    assert value[0]['readings'][0] is a
+    assert pool.intern_value({'page': int('1024')})['page'] is value[0]['page']
+    assert pool.intern_value(True) is True
+    assert len(pool) == 2
+
+    pool.clear()
+    assert len(pool) == 0
+    assert pool.hits == 3
@@ -14,6 +14,8 @@ def run():
     p = Packager.from_cli(sys.argv[1:])
     p.download()
     p.export()
+    if p.options['stats'] == 'json':
+        print(p.stats.to_json())
 
 
 if __name__ == '__main__':
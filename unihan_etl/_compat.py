@@ -14,8 +14,20 @@ if PY2:
     from StringIO import StringIO
 
     from urllib import urlretrieve
+    from urllib2 import HTTPError, Request, urlopen
+    from httplib import IncompleteRead
     from itertools import izip
 
+    import collections as collections_abc
+    import imp
+
+    def find_module(name):
+        try:
+            imp.find_module(name)
+        except ImportError:
+            return False
+        return True
+
     exec('def reraise(tp, value, tb=None):\n raise tp, value, tb')
 else:
     unichr = chr
@@ -24,10 +36,18 @@ else:
 
     from io import StringIO, BytesIO
 
-    from urllib.request import urlretrieve
+    from urllib.request import Request, urlopen, urlretrieve
+    from urllib.error import HTTPError
+    from http.client import IncompleteRead
 
     izip = zip
 
+    import collections.abc as collections_abc
+    from importlib.util import find_spec
+
+    def find_module(name):
+        return find_spec(name) is not None
+
     def reraise(tp, value, tb=None):
         if value.__traceback__ is not tb:
             raise (value.with_traceback(tb))
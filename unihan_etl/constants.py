@@ -116,6 +116,11 @@ UNIHAN_MANIFEST = {
     ),
 }
 
+#: Dictionary mapping fields to the file in :attr:`UNIHAN_MANIFEST` holding them
+UNIHAN_FIELD_FILES = {
+    field: file_ for file_, fields in UNIHAN_MANIFEST.items() for field in fields
+}
+
 #: FIELDS with multiple values via custom delimiters
 CUSTOM_DELIMITED_FIELDS = (
     'kDefinition',
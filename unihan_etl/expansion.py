@@ -5,25 +5,135 @@ Functions to uncompact details inside field values.
 Notes
 -----
 
-:func:`re.compile` operations are inside of expand functions:
-
-1. readability
-2. module-level function bytecode is cached in python
-3. the last used compiled regexes are cached
+Regular expressions are compiled once, at import, into :attr:`PATTERNS`.
+Location grammars shared between fields (e.g. Hanyu Da Zidian's
+volume/page/character/virtual) are only written once.
 """
 
 from __future__ import absolute_import, unicode_literals
 
+import collections
+import copy
+import marshal
 import re
 
 import zhon.hanzi
 import zhon.pinyin
 
+from unihan_etl._compat import PY2, text_type
 from unihan_etl.constants import SPACE_DELIMITED_FIELDS
 
 #: diacritics from kHanyuPinlu
 N_DIACRITICS = 'ńňǹ'
 
+#: Location in Hanyu Da Zidian, virtual position is interpolated
+HDZ_LOCATION = r"""
+    (?P<volume>[1-8])
+    (?P<page>[0-9]{4})\.
+    (?P<character>[0-3][0-9])
+    (?P<virtual>%s)
+"""
+
+#: Location in a single volume work (page, character, virtual)
+PAGE_LOCATION = r"""
+    (?P<page>[0-9]{4})\.
+    (?P<character>[0-9]{2})
+    (?P<virtual>[01])
+"""
+
+#: Compiled regular expressions used by the expand functions
+PATTERNS = {
+    'hdz_location': re.compile(HDZ_LOCATION % '[0-3]', re.X),
+    'irg_hdz_location': re.compile(HDZ_LOCATION % '[01]', re.X),
+    'page_location': re.compile(PAGE_LOCATION, re.X),
+    'kXHC1983': re.compile(
+        r"""
+        (?P<page>[0-9]{4})\.
+        (?P<character>[0-9]{2})
+        (?P<entry>[0-9]{1})
+        (?P<substituted>\*?)
+    """,
+        re.X,
+    ),
+    'kCheungBauer': re.compile(
+        r"""
+        (?P<radical>[0-9]{3})\/(?P<strokes>[0-9]{2});
+        (?P<cangjie>[A-Z]*);
+        (?P<readings>[a-z1-6\[\]\/,]+)
+    """,
+        re.X,
+    ),
+    'kRSAdobe_Japan1_6': re.compile(
+        r"""
+        (?P<type>[CV])\+
+        (?P<cid>[0-9]{1,5})\+
+        (?P<radical>[1-9][0-9]{0,2})\.
+        (?P<strokes>[1-9][0-9]?)\.
+        (?P<strokes_residue>[0-9]{1,2})
+    """,
+        re.X,
+    ),
+    'kCihaiT': re.compile(
+        r"""
+        (?P<page>[1-9][0-9]{0,3})\.
+        (?P<row>[0-9]{1})
+        (?P<character>[0-9]{2})
+    """,
+        re.X,
+    ),
+    'kFenn': re.compile(
+        """
+        (?P<phonetic>[0-9]+a?)
+        (?P<frequency>[A-KP*])
+    """,
+        re.X,
+    ),
+    'kHanyuPinlu': re.compile(
+        """
+        (?P<phonetic>[a-z({}{}]+)
+        \\((?P<frequency>[0-9]+)\\)
+    """.format(
+            zhon.pinyin.lowercase, N_DIACRITICS
+        ),
+        re.X,
+    ),
+    'kHDZRadBreak': re.compile(
+        r"""
+        (?P<radical>[{}]+)
+        \[(?P<ucn>U\+2F[0-9A-D][0-9A-F])\]
+    """.format(
+            zhon.hanzi.radicals
+        ),
+        re.X,
+    ),
+    'rs_generic': re.compile(
+        r"""
+        (?P<radical>[1-9][0-9]{0,2})
+        (?P<simplified>\'?)\.
+        (?P<strokes>-?[0-9]{1,2})
+    """,
+        re.X,
+    ),
+    'kGSR': re.compile(
+        r"""
+        (?P<set>[0-9]{4})
+        (?P<letter>[a-vx-z])
+        (?P<apostrophe>\')?
+    """,
+        re.X,
+    ),
+}
+
+
+def _hdz_location(pattern, value):
+    m = pattern.match(value).groupdict()
+    return {
+        "volume": int(m['volume']),
+        "page": int(m['page']),
+        "character": int(m['character']),
+        "virtual": int(m['virtual']),
+    }
+
 
 def expand_kDefinition(value):
     return [c.strip() for c in value.split(';')]
@@ -48,85 +158,35 @@ def expand_kTotalStrokes(value):
 
 
 def expand_kHanYu(value):
-    pattern = re.compile(
-        r"""
-        (?P<volume>[1-8])
-        (?P<page>[0-9]{4})\.
-        (?P<character>[0-3][0-9])
-        (?P<virtual>[0-3])
-    """,
-        re.X,
-    )
+    pattern = PATTERNS['hdz_location']
 
     for i, v in enumerate(value):
-        m = pattern.match(v).groupdict()
-        value[i] = {
-            "volume": int(m['volume']),
-            "page": int(m['page']),
-            "character": int(m['character']),
-            "virtual": int(m['virtual']),
-        }
+        value[i] = _hdz_location(pattern, v)
     return value
 
 
 def expand_kIRGHanyuDaZidian(value):
-    pattern = re.compile(
-        r"""
-        (?P<volume>[1-8])
-        (?P<page>[0-9]{4})\.
-        (?P<character>[0-3][0-9])
-        (?P<virtual>[01])
-    """,
-        re.X,
-    )
+    pattern = PATTERNS['irg_hdz_location']
 
     for i, v in enumerate(value):
-        m = pattern.match(v).groupdict()
-        value[i] = {
-            "volume": int(m['volume']),
-            "page": int(m['page']),
-            "character": int(m['character']),
-            "virtual": int(m['virtual']),
-        }
+        value[i] = _hdz_location(pattern, v)
     return value
 
 
 def expand_kHanyuPinyin(value):
-    location_pattern = re.compile(
-        r"""
-        (?P<volume>[1-8])
-        (?P<page>[0-9]{4})\.
-        (?P<character>[0-3][0-9])
-        (?P<virtual>[0-3])
-    """,
-        re.X,
-    )
+    location_pattern = PATTERNS['hdz_location']
 
     for i, v in enumerate(value):
         v = [s.split(',') for s in v.split(':')]
         value[i] = {"locations": v[0], "readings": v[1]}
 
         for n, loc in enumerate(value[i]['locations']):
-            m = location_pattern.match(loc).groupdict()
-            value[i]['locations'][n] = {
-                "volume": int(m['volume']),
-                "page": int(m['page']),
-                "character": int(m['character']),
-                "virtual": int(m['virtual']),
-            }
+            value[i]['locations'][n] = _hdz_location(location_pattern, loc)
     return value
 
 
 def expand_kXHC1983(value):
-    pattern = re.compile(
-        r"""
-        (?P<page>[0-9]{4})\.
-        (?P<character>[0-9]{2})
-        (?P<entry>[0-9]{1})
-        (?P<substituted>\*?)
-    """,
-        re.X,
-    )
+    pattern = PATTERNS['kXHC1983']
 
     for i, v in enumerate(value):
         vals = v.split(':')
@@ -144,14 +204,8 @@ def expand_kXHC1983(value):
 
 
 def expand_kCheungBauer(value):
-    pattern = re.compile(
-        r"""
-        (?P<radical>[0-9]{3})\/(?P<strokes>[0-9]{2});
-        (?P<cangjie>[A-Z]*);
-        (?P<readings>[a-z1-6\[\]\/,]+)
-    """,
-        re.X,
-    )
+    pattern = PATTERNS['kCheungBauer']
+
     for i, v in enumerate(value):
         m = pattern.match(v).groupdict()
         value[i] = {
@@ -164,16 +218,7 @@ def expand_kCheungBauer(value):
 
 
 def expand_kRSAdobe_Japan1_6(value):
-    pattern = re.compile(
-        r"""
-        (?P<type>[CV])\+
-        (?P<cid>[0-9]{1,5})\+
-        (?P<radical>[1-9][0-9]{0,2})\.
-        (?P<strokes>[1-9][0-9]?)\.
-        (?P<strokes_residue>[0-9]{1,2})
-    """,
-        re.X,
-    )
+    pattern = PATTERNS['kRSAdobe_Japan1_6']
 
     for i, v in enumerate(value):
         m = pattern.match(v).groupdict()
@@ -189,14 +234,8 @@ def expand_kRSAdobe_Japan1_6(value):
 
 
 def expand_kCihaiT(value):
-    pattern = re.compile(
-        r"""
-        (?P<page>[1-9][0-9]{0,3})\.
-        (?P<row>[0-9]{1})
-        (?P<character>[0-9]{2})
-    """,
-        re.X,
-    )
+    pattern = PATTERNS['kCihaiT']
+
     for i, v in enumerate(value):
         m = pattern.match(v).groupdict()
         value[i] = {
@@ -214,15 +253,7 @@ def expand_kIICore(value):
 
 
 def expand_kDaeJaweon(value):
-    pattern = re.compile(
-        r"""
-        (?P<page>[0-9]{4})\.
-        (?P<character>[0-9]{2})
-        (?P<virtual>[01])
-    """,
-        re.X,
-    )
-    m = pattern.match(value).groupdict()
+    m = PATTERNS['page_location'].match(value).groupdict()
 
     value = {
         "page": int(m['page']),
@@ -245,13 +276,7 @@ def expand_kIRGDaeJaweon(value):
 
 
 def expand_kFenn(value):
-    pattern = re.compile(
-        """
-        (?P<phonetic>[0-9]+a?)
-        (?P<frequency>[A-KP*])
-    """,
-        re.X,
-    )
+    pattern = PATTERNS['kFenn']
 
     for i, v in enumerate(value):
         m = pattern.match(v).groupdict(v)
@@ -260,15 +285,7 @@ def expand_kFenn(value):
 
 
 def expand_kHanyuPinlu(value):
-    pattern = re.compile(
-        """
-        (?P<phonetic>[a-z({}{}]+)
-        \((?P<frequency>[0-9]+)\)
-    """.format(
-            zhon.pinyin.lowercase, N_DIACRITICS
-        ),
-        re.X,
-    )
+    pattern = PATTERNS['kHanyuPinlu']
 
     for i, v in enumerate(value):
         m = pattern.match(v).groupdict()
@@ -279,34 +296,9 @@ def expand_kHanyuPinlu(value):
 def expand_kHDZRadBreak(value):
     rad, loc = value.split(':')
 
-    location_pattern = re.compile(
-        r"""
-        (?P<volume>[1-8])
-        (?P<page>[0-9]{4})\.
-        (?P<character>[0-3][0-9])
-        (?P<virtual>[01])
-    """,
-        re.X,
-    )
-
-    l = location_pattern.match(loc).groupdict()
-    location = {
-        "volume": int(l['volume']),
-        "page": int(l['page']),
-        "character": int(l['character']),
-        "virtual": int(l['virtual']),
-    }
+    location = _hdz_location(PATTERNS['irg_hdz_location'], loc)
 
-    pattern = re.compile(
-        r"""
-        (?P<radical>[{}]+)
-        \[(?P<ucn>U\+2F[0-9A-D][0-9A-F])\]
-    """.format(
-            zhon.hanzi.radicals
-        ),
-        re.X,
-    )
-    m = pattern.match(rad).groupdict()
+    m = PATTERNS['kHDZRadBreak'].match(rad).groupdict()
 
     return {"radical": m['radical'], "ucn": m['ucn'], "location": location}
 
@@ -319,14 +311,7 @@ def expand_kSBGY(value):
 
 
 def _expand_kRSGeneric(value):
-    pattern = re.compile(
-        r"""
-        (?P<radical>[1-9][0-9]{0,2})
-        (?P<simplified>\'?)\.
-        (?P<strokes>-?[0-9]{1,2})
-    """,
-        re.X,
-    )
+    pattern = PATTERNS['rs_generic']
 
     for i, v in enumerate(value):
         m = pattern.match(v).groupdict()
@@ -363,14 +348,7 @@ expand_kIRG_VSource = _expand_kIRG_GenericSource
 
 
 def expand_kGSR(value):
-    pattern = re.compile(
-        r"""
-        (?P<set>[0-9]{4})
-        (?P<letter>[a-vx-z])
-        (?P<apostrophe>\')?
-    """,
-        re.X,
-    )
+    pattern = PATTERNS['kGSR']
 
     for i, v in enumerate(value):
         m = pattern.match(v).groupdict()
@@ -392,6 +370,41 @@ def expand_kCheungBauerIndex(value):
 expand_kFennIndex = expand_kCheungBauerIndex
 
 
+#: Map of UNIHAN field names to their expansion functions
+EXPANDERS = {
+    name[len('expand_') :]: func
+    for name, func in list(globals().items())
+    if name.startswith('expand_') and callable(func)
+}
+
+
+def register_expander(field, func=None):
+    """
+    Register a custom expansion function for a UNIHAN field.
+
+    Replaces any expander already registered for the field. Can be used as a
+    decorator when *func* is omitted.
+
+    Parameters
+    ----------
+    field : str
+        field name, e.g. ``kDefinition``
+    func : callable, optional
+        accepts the field value (already split, for space delimited fields)
+        and returns the expanded value
+
+    Returns
+    -------
+    callable :
+        *func*, unchanged
+    """
+    if func is None:
+        return lambda f: register_expander(field, f)
+
+    EXPANDERS[field] = func
+    return func
+
+
 def expand_field(field, fvalue):
     """
     Return structured value of information in UNIHAN field.
@@ -411,10 +424,88 @@ def expand_field(field, fvalue):
     if field in SPACE_DELIMITED_FIELDS and fvalue:
         fvalue = fvalue.split(' ')
 
-    try:
-        expansion_func = eval('expand_%s' % field)
+    expansion_func = EXPANDERS.get(field)
+    if expansion_func is not None:
         return expansion_func(fvalue)
-    except NameError:
-        pass
 
     return fvalue
+
+
+#: Immutable values, cached as is
+_SCALARS = (text_type, bytes, int, float, type(None))
+
+
+def _freeze(value):
+    """
+    Return expanded value to cache, and function returning a copy of it.
+
+    Immutable values are kept as is, lists and dicts of them are copied
+    shallowly. Other values are kept marshalled, or deep copied if marshal
+    can't store them, e.g. from an expander added with
+    :func:`register_expander`.
+    """
+    if isinstance(value, _SCALARS):
+        return value, None
+    if isinstance(value, (list, dict)):
+        items = value.values() if isinstance(value, dict) else value
+        if all(isinstance(v, _SCALARS) for v in items):
+            return value, type(value)
+    try:
+        return marshal.dumps(value), marshal.loads
+    except ValueError:
+        return value, copy.deepcopy
+
+
+class ExpansionCache(object):
+    """Memoize :func:`expand_field` by field and raw value, evicting LRU.
+
+    Raw values repeat a lot across characters (readings, stroke counts,
+    radical/stroke pairs, IRG source prefixes). Results are copied on the
+    way out, so items can be changed without touching the cache. Only fields
+    with an expander in :attr:`EXPANDERS` are memoized.
+
+    Parameters
+    ----------
+    maxsize : int, optional
+        most values kept
+    """
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._cache = collections.OrderedDict()
+        #: :class:`collections.Counter`: cache hits per field
+        self.hits = collections.Counter()
+        #: :class:`collections.Counter`: cache misses per field
+        self.misses = collections.Counter()
+
+    def expand_field(self, field, fvalue):
+        """Return expanded value, like :func:`expand_field`."""
+        if field not in EXPANDERS:  # split at most, cheaper than a lookup
+            return expand_field(field, fvalue)
+
+        key = (field, fvalue)
+        cache = self._cache
+        try:
+            value, copy_fn = cache[key]
+        except KeyError:
+            self.misses[field] += 1
+            value, copy_fn = cache[key] = _freeze(expand_field(field, fvalue))
+            if len(cache) > self.maxsize:
+                cache.popitem(last=False)
+        else:
+            self.hits[field] += 1
+            if PY2:
+                cache[key] = cache.pop(key)
+            else:
+                cache.move_to_end(key)
+        return copy_fn(value) if copy_fn is not None else value
+
+    def __len__(self):
+        return len(self._cache)
+
+    def stats(self):
+        """Return dict of field to ``{'hits': int, 'misses': int}``."""
+        return {
+            field: {'hits': self.hits[field], 'misses': self.misses[field]}
+            for field in set(self.hits) | set(self.misses)
+        }
@@ -0,0 +1,254 @@
+# -*- coding: utf8 -*-
+"""Look up single characters in extracted UNIHAN files, without an export.
+
+lookup
+~~~~~~
+
+:class:`UnihanIndex` scans the files once, recording where each codepoint's
+lines start. A lookup seeks there, reads only that codepoint's lines, and
+expands only the values asked for.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import glob
+import logging
+import mmap
+import os
+import re
+
+from . import expansion
+from ._compat import string_types
+from .util import ucn_to_unicode
+
+log = logging.getLogger(__name__)
+
+#: Start of a UNIHAN line: codepoint, field
+LINE_PATTERN = re.compile(br'^U\+([0-9A-F]+)\t([^\t\n]+)\t', re.M)
+
+
+def to_codepoint(char_or_ucn):
+    """
+    Return codepoint of a character or UCN.
+
+    Parameters
+    ----------
+    char_or_ucn : str or int
+        character, e.g. ``'㐀'``, UCN, e.g. ``'U+3400'``, ``'u+3400'`` or
+        ``'3400'``, or codepoint. A single character is a character, not hex.
+
+    Returns
+    -------
+    int :
+        codepoint, e.g. ``13312``
+
+    Raises
+    ------
+    ValueError :
+        string isn't a character or UCN
+    """
+    if not isinstance(char_or_ucn, string_types):
+        return char_or_ucn
+    if len(char_or_ucn) == 1:
+        return ord(char_or_ucn)
+    if len(char_or_ucn) == 2 and '\ud800' <= char_or_ucn[0] <= '\udbff':
+        high, low = char_or_ucn  # python 2 narrow build, surrogate pair
+        return 0x10000 + ((ord(high) - 0xD800) << 10) + (ord(low) - 0xDC00)
+    if char_or_ucn[:2] in ('U+', 'u+'):
+        char_or_ucn = char_or_ucn[2:]
+    return int(char_or_ucn, 16)
+
+
+def _file_stat(path):
+    """Return size and modification time of a file, None if missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime
+
+
+class UnihanIndex(object):
+    """Byte offsets of UNIHAN lines by codepoint, and files by field.
+
+    Lines of a codepoint are contiguous in each file, the offset of the first
+    one is stored per file. Files changed since (by size or modification
+    time), e.g. extracted again, are indexed again on the next lookup.
+
+    Parameters
+    ----------
+    files : list of str
+        paths of extracted UNIHAN files, e.g. ``Unihan_Readings.txt``
+    """
+
+    def __init__(self, files):
+        #: list of str: paths of UNIHAN files
+        self.files = list(files)
+        #: dict: codepoint to dict of file number to byte offset
+        self.offsets = None
+        #: dict: field to file number holding it
+        self.field_files = None
+        #: list: size and modification time of files when indexed
+        self.file_stats = None
+
+    @classmethod
+    def from_dir(cls, work_dir):
+        """Return index of UNIHAN files extracted in *work_dir*."""
+        return cls(sorted(glob.glob(os.path.join(work_dir, 'Unihan*.txt'))))
+
+    def build(self):
+        """Scan files, recording offsets. Called on first lookup."""
+        log.info('Indexing: %s.' % ', '.join(self.files))
+        file_stats = [_file_stat(path) for path in self.files]
+        offsets = {}
+        field_files = {}
+        for file_no, path in enumerate(self.files):
+            with open(path, 'rb') as f:
+                if not os.fstat(f.fileno()).st_size:
+                    continue  # empty files can't be mapped
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    last = None
+                    for match in LINE_PATTERN.finditer(m):
+                        field_files.setdefault(match.group(2), file_no)
+                        hexcode = match.group(1)
+                        if hexcode != last:
+                            last = hexcode
+                            codepoint_offsets = offsets.setdefault(int(hexcode, 16), {})
+                            codepoint_offsets.setdefault(file_no, match.start())
+                finally:
+                    m.close()
+
+        self.offsets = offsets
+        self.file_stats = file_stats
+        self.field_files = {
+            field.decode('ascii'): file_no for field, file_no in field_files.items()
+        }
+        return self
+
+    def is_stale(self):
+        """Return True if files changed since indexed, e.g. extracted again."""
+        return self.file_stats != [_file_stat(path) for path in self.files]
+
+    def _update(self):
+        if self.offsets is None or self.is_stale():
+            self.build()
+
+    def __contains__(self, char_or_ucn):
+        self._update()
+        return to_codepoint(char_or_ucn) in self.offsets
+
+    def read(self, char_or_ucn, fields=None):
+        """
+        Return raw values of a character, read from its lines.
+
+        Parameters
+        ----------
+        char_or_ucn : str or int
+            character, UCN or codepoint
+        fields : list of str, optional
+            fields to read, all by default
+
+        Returns
+        -------
+        dict :
+            field to raw value. Empty if the character isn't in UNIHAN.
+        """
+        self._update()
+
+        codepoint = to_codepoint(char_or_ucn)
+        ucn = 'U+%04X' % codepoint
+        file_offsets = self.offsets.get(codepoint, {})
+        if fields is not None:
+            file_nos = set(
+                self.field_files[field] for field in fields if field in self.field_files
+            )
+            file_offsets = {n: o for n, o in file_offsets.items() if n in file_nos}
+
+        values = {}
+        for file_no, offset in sorted(file_offsets.items()):
+            with open(self.files[file_no], 'rb') as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.startswith(b'U+'):
+                        break  # blank or comment line, e.g. # EOF
+                    line_ucn, field, value = line.decode('utf-8').split('\t', 2)
+                    if line_ucn != ucn:  # next codepoint, or offset out of date
+                        break
+                    if fields is None or field in fields:
+                        values[field] = value.rstrip()
+        return values
+
+    def lookup(self, char_or_ucn, fields=None, expand=True):
+        """
+        Return a character's fields, like an item of :meth:`Packager.export`.
+
+        Only the character's lines are read, and only their values expanded.
+
+        Parameters
+        ----------
+        char_or_ucn : str or int
+            character, e.g. ``'㐀'``, UCN, e.g. ``'U+3400'``, or codepoint
+        fields : list of str, optional
+            fields to return, all by default
+        expand : bool, optional
+            expand multi-value fields, see :func:`~unihan_etl.expansion.expand_field`
+
+        Returns
+        -------
+        dict or None :
+            unihan character information, fields it has no value for are left
+            out. None if the character isn't in UNIHAN.
+
+        Examples
+        --------
+        >>> index = UnihanIndex.from_dir(work_dir)  # doctest: +SKIP
+        >>> index.lookup('U+3400', fields=['kMandarin'])  # doctest: +SKIP
+        {'ucn': 'U+3400', 'char': '㐀', 'kMandarin': {'zh-Hans': 'qiū', ...}}
+        """
+        values = self.read(char_or_ucn, fields)
+        if not values:
+            return None
+
+        codepoint = to_codepoint(char_or_ucn)
+        char = {'ucn': 'U+%04X' % codepoint, 'char': ucn_to_unicode(codepoint)}
+        for field, value in values.items():
+            if expand and value:
+                value = expansion.expand_field(field, value)
+            if value:
+                char[field] = value
+        return char
+
+
+_indexes = {}
+
+
+def lookup(char_or_ucn, fields=None, expand=True, work_dir=None):
+    """
+    Return a character's fields, from UNIHAN files extracted in *work_dir*.
+
+    The :class:`UnihanIndex` of *work_dir* is built on first use and kept.
+
+    Parameters
+    ----------
+    char_or_ucn : str or int
+        character, e.g. ``'㐀'``, UCN, e.g. ``'U+3400'``, or codepoint
+    fields : list of str, optional
+        fields to return, all by default
+    expand : bool, optional
+        expand multi-value fields
+    work_dir : str, optional
+        directory UNIHAN is extracted to. Default:
+        :attr:`~unihan_etl.process.WORK_DIR`
+
+    Returns
+    -------
+    dict or None :
+        see :meth:`UnihanIndex.lookup`
+    """
+    if work_dir is None:
+        from .process import WORK_DIR as work_dir
+
+    index = _indexes.get(work_dir)
+    if index is None:
+        index = _indexes[work_dir] = UnihanIndex.from_dir(work_dir)
+    return index.lookup(char_or_ucn, fields=fields, expand=expand)
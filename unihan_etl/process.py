@@ -4,13 +4,25 @@
 from __future__ import absolute_import, unicode_literals
 
 import argparse
+import bisect
 import codecs
+import collections
 import fileinput
+import functools
 import glob
+import hashlib
+import heapq
+import io
+import itertools
 import json
 import logging
+import mmap
+import multiprocessing
 import os
+import pickle
+import re
 import shutil
+import sqlite3
 import sys
 import zipfile
 
@@ -24,9 +36,28 @@ from unihan_etl.__about__ import (
     __title__,
     __version__,
 )
-from unihan_etl._compat import PY2, text_type, urlretrieve
-from unihan_etl.constants import INDEX_FIELDS, UNIHAN_MANIFEST
-from unihan_etl.util import _dl_progress, merge_dict, ucn_to_unicode
+from unihan_etl._compat import (
+    PY2,
+    HTTPError,
+    IncompleteRead,
+    Request,
+    collections_abc,
+    find_module,
+    izip,
+    urlopen,
+    urlretrieve,
+)
+from unihan_etl.constants import INDEX_FIELDS, UNIHAN_FIELD_FILES, UNIHAN_MANIFEST
+from unihan_etl.stats import BuildStats
+from unihan_etl.store import ColumnStore, LazyColumnStore
+from unihan_etl.util import (
+    ValuePool,
+    _dl_progress,
+    file_crc32,
+    file_sha256,
+    merge_dict,
+    ucn_to_unicode,
+)
 
 if PY2:
     import unicodecsv as csv
@@ -63,17 +94,14 @@ def files_exist(path, files):
     return all(os.path.exists(os.path.join(path, f)) for f in files)
 
 
-#: Return list of files from list of fields.
 def get_files(fields):
+    """Return list of files from list of fields."""
     files = set()
 
     for field in fields:
-        if field in UNIHAN_FIELDS:
-            for file_, file_fields in UNIHAN_MANIFEST.items():
-                if any(file_ for h in fields if h in file_fields):
-                    files.add(file_)
-        else:
+        if field not in UNIHAN_FIELD_FILES:
             raise KeyError('Field {0} not found in file list.'.format(field))
+        files.add(UNIHAN_FIELD_FILES[field])
 
     return list(files)
 
@@ -84,14 +112,22 @@ WORK_DIR = os.path.join(dirs.user_cache_dir, 'downloads')
 UNIHAN_FILES = UNIHAN_MANIFEST.keys()
 #: URI of Unihan.zip data.
 UNIHAN_URL = 'http://www.unicode.org/Public/UNIDATA/Unihan.zip'
+#: Directory to cache built data in, see :meth:`Packager.export`.
+BUILD_CACHE_DIR = os.path.join(dirs.user_cache_dir, 'builds')
+#: Builds kept in :attr:`BUILD_CACHE_DIR`, least recently used are removed.
+BUILD_CACHE_SIZE = 3
 #: Filepath to output built CSV file to.
 DESTINATION_DIR = dirs.user_data_dir
 #: Filepath to download Zip file.
 UNIHAN_ZIP_PATH = os.path.join(WORK_DIR, 'Unihan.zip')
 #: Default Unihan fields
 UNIHAN_FIELDS = tuple(get_fields(UNIHAN_MANIFEST))
+#: Ways of merging fields of UNIHAN files per codepoint, see :meth:`Packager.export`
+MERGE_MODES = ('store', 'kway')
 #: Allowed export types
-ALLOWED_EXPORT_TYPES = ['json', 'csv']
+ALLOWED_EXPORT_TYPES = ['json', 'csv', 'pickle', 'sqlite', 'ndjson']
+#: Version of pickle snapshot layout, see :func:`load_pickle`
+PICKLE_VERSION = 1
 try:
     import yaml
 
@@ -99,6 +135,24 @@ try:
 except ImportError:
     pass
 
+# pyarrow is slow to import, it's imported when exporting
+if find_module('pyarrow'):
+    ALLOWED_EXPORT_TYPES += ['parquet', 'arrow']
+
+#: Fastest JSON encoder installed: orjson, ujson or json (standard library)
+JSON_BACKEND = 'json'
+try:
+    import orjson
+
+    JSON_BACKEND = 'orjson'
+except ImportError:
+    try:
+        import ujson
+
+        JSON_BACKEND = 'ujson'
+    except ImportError:
+        pass
+
 DEFAULT_OPTIONS = {
     'source': UNIHAN_URL,
     'destination': '%s/unihan.{ext}' % DESTINATION_DIR,
@@ -108,8 +162,23 @@ DEFAULT_OPTIONS = {
     'format': 'csv',
     'input_files': UNIHAN_FILES,
     'download': False,
+    'refresh': False,
+    'sha256': None,
+    'extract': True,
+    'mmap': False,
     'expand': True,
     'prune_empty': True,
+    'stream': False,
+    'lazy': False,
+    'merge': 'store',
+    'compact': False,
+    'shards': 1,
+    'jobs': 1,
+    'expand_cache': 0,
+    'intern': False,
+    'stats': None,
+    'cache': False,
+    'cache_dir': BUILD_CACHE_DIR,
     'log_level': 'INFO',
 }
 
@@ -137,6 +206,20 @@ def get_parser():
         dest="source",
         help="URL or path of zipfile. Default: %s" % UNIHAN_URL,
     )
+    parser.add_argument(
+        "--refresh",
+        dest="refresh",
+        action='store_true',
+        help=(
+            "Check source for a newer zip, with a conditional request. "
+            + "Nothing is transferred if unchanged."
+        ),
+    )
+    parser.add_argument(
+        "--sha256",
+        dest="sha256",
+        help="Expected SHA-256 of the downloaded zip, checked after download.",
+    )
     parser.add_argument(
         "-z",
         "--zip-path",
@@ -159,6 +242,15 @@ def get_parser():
         choices=ALLOWED_EXPORT_TYPES,
         help="Default: %s" % DEFAULT_OPTIONS['format'],
     )
+    parser.add_argument(
+        "--no-extract",
+        dest="extract",
+        action='store_false',
+        help=(
+            "Don't extract the zip to the work dir. "
+            + "Read UNIHAN files straight out of the zip instead."
+        ),
+    )
     parser.add_argument(
         "--no-expand",
         dest="expand",
@@ -174,6 +266,96 @@ def get_parser():
         action='store_false',
         help=("Don't prune fields with empty keys" + "Doesn't apply to CSVs."),
     )
+    parser.add_argument(
+        "--stream",
+        dest="stream",
+        action='store_true',
+        help=(
+            "Expand, prune and export one character at a time, instead of "
+            + "building all data first."
+        ),
+    )
+    parser.add_argument(
+        "--mmap",
+        dest="mmap",
+        action='store_true',
+        help=(
+            "Scan extracted files memory-mapped, decode lines of picked fields "
+            + "only. Faster for builds of a few fields."
+        ),
+    )
+    parser.add_argument(
+        "--merge",
+        dest="merge",
+        choices=MERGE_MODES,
+        help=(
+            "store: collect fields per codepoint in memory. kway: read all "
+            + "files at once, merge on codepoint, in order. "
+            + "Default: %s" % DEFAULT_OPTIONS['merge']
+        ),
+    )
+    parser.add_argument(
+        "--compact",
+        dest="compact",
+        action='store_true',
+        help="Compact JSON, without indentation or spaces.",
+    )
+    parser.add_argument(
+        "--shards",
+        dest="shards",
+        type=int,
+        help=(
+            "Split ndjson output into this many files, by codepoint range. "
+            + "Default: %s" % DEFAULT_OPTIONS['shards']
+        ),
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        dest="jobs",
+        type=int,
+        help=(
+            "Number of processes to parse files and expand fields with, 0 "
+            + "for one per CPU. "
+            + "Default: %s" % DEFAULT_OPTIONS['jobs']
+        ),
+    )
+
+    parser.add_argument(
+        "--stats",
+        dest="stats",
+        choices=['json'],
+        help=(
+            "Print time, memory use, line and item counts per build stage, "
+            + "to stdout. Download progress goes to stderr then."
+        ),
+    )
+
+    parser.add_argument(
+        "--intern",
+        dest="intern",
+        action='store_true',
+        help="Share repeated values in memory while building.",
+    )
+    parser.add_argument(
+        "--expand-cache",
+        dest="expand_cache",
+        type=int,
+        help=(
+            "Memoize this many expanded values, repeated values are expanded "
+            + "once. Default: %s (off)" % DEFAULT_OPTIONS['expand_cache']
+        ),
+    )
+
+    parser.add_argument(
+        "--cache",
+        dest="cache",
+        action='store_true',
+        help=(
+            "Reuse data built from the same zip and options. "
+            + "Cached in: %s" % BUILD_CACHE_DIR
+        ),
+    )
 
     parser.add_argument(
         "-f",
@@ -252,10 +434,210 @@ def zip_has_files(files, zip_file):
         return False
 
 
-def download(url, dest, urlretrieve_fn=urlretrieve, reporthook=None):
+def is_url(source):
+    """Return True if source is an HTTP(S) URL."""
+    return source.startswith(('http://', 'https://'))
+
+
+def check_sha256(path, sha256):
+    """
+    Raise if a file doesn't have the expected checksum, removing it.
+
+    Parameters
+    ----------
+    path : str
+        file to check
+    sha256 : str
+        expected hex digest
+
+    Raises
+    ------
+    ValueError :
+        checksum doesn't match
+    """
+    digest = file_sha256(path)
+    if digest != sha256.lower():
+        os.remove(path)
+        raise ValueError(
+            'SHA-256 of {0} is {1}, expected {2}'.format(path, digest, sha256)
+        )
+
+
+def _headers_path(path):
+    return path + '.headers.json'
+
+
+def _load_validators(path):
+    """Return saved ``ETag`` / ``Last-Modified`` of a downloaded file."""
+    try:
+        with open(_headers_path(path)) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
+def _save_validators(path, headers):
+    validators = {
+        'etag': headers.get('ETag'),
+        'last_modified': headers.get('Last-Modified'),
+    }
+    with open(_headers_path(path), 'w') as f:
+        json.dump({k: v for k, v in validators.items() if v}, f)
+
+
+def _move(src, dest):
+    if os.path.exists(dest):
+        os.remove(dest)
+    os.rename(src, dest)
+
+
+def _request_headers(dest, part, offset):
+    """Return headers resuming *part* from offset, or revalidating *dest*."""
+    headers = {}
+    if offset:
+        validators = _load_validators(part)
+        headers['Range'] = 'bytes=%i-' % offset
+        if validators:
+            headers['If-Range'] = validators.get('etag') or validators['last_modified']
+    elif os.path.isfile(dest):
+        validators = _load_validators(dest)
+        if 'etag' in validators:
+            headers['If-None-Match'] = validators['etag']
+        if 'last_modified' in validators:
+            headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+def _read_response(response, part, offset, total, reporthook, block_size):
+    """
+    Write body of response to *part* from offset, return False if cut short.
+
+    Errors reading the response cut it short, errors writing are raised.
+    """
+    with open(part, 'ab' if offset else 'wb') as f:
+        f.truncate(offset)
+        count = offset // block_size
+        while True:
+            try:
+                block = response.read(block_size)
+            except (IncompleteRead, IOError) as e:  # connection, not disk
+                log.warning('Download to %s cut short, resume later: %s' % (part, e))
+                return False
+            if not block:
+                break
+            f.write(block)
+            count += 1
+            if reporthook:
+                reporthook(count, block_size, total)
+
+    if total != -1 and os.path.getsize(part) < total:
+        log.warning('Download to %s cut short, resume later.' % part)
+        return False
+    return True
+
+
+def _finish_download(dest, part, sha256):
+    """Check *part* against sha256, and move it and its headers to *dest*."""
+    if sha256:
+        try:
+            check_sha256(part, sha256)
+        except ValueError:
+            os.remove(_headers_path(part))
+            raise
+
+    _move(part, dest)
+    _move(_headers_path(part), _headers_path(dest))
+
+
+def fetch(url, dest, sha256=None, reporthook=None, block_size=1 << 16):
+    """
+    Download URL to a destination over HTTP, resuming and revalidating.
+
+    A download in progress is kept in ``<dest>.part`` and resumed with a
+    ``Range`` request. Once *dest* exists, it's revalidated with
+    ``If-None-Match`` / ``If-Modified-Since``, from the ``ETag`` and
+    ``Last-Modified`` saved in ``<dest>.headers.json``: nothing is
+    transferred if unchanged.
+
+    Parameters
+    ----------
+    url : str
+        URL to download from.
+    dest : str
+        file path where download is to be saved.
+    sha256 : str, optional
+        expected SHA-256 hex digest of the file
+    reporthook : function, optional
+        Function to write progress bar to stdout buffer.
+    block_size : int, optional
+        bytes read at a time
+
+    Returns
+    -------
+    bool :
+        True if *dest* was downloaded. False if not modified, or if the
+        download was cut short (call again to resume).
+
+    Raises
+    ------
+    ValueError :
+        downloaded file doesn't match *sha256*
+    IOError :
+        writing the download failed, e.g. disk full
+    """
+    part = dest + '.part'
+    offset = os.path.getsize(part) if os.path.isfile(part) else 0
+    headers = _request_headers(dest, part, offset)
+
+    try:
+        response = urlopen(Request(url, headers=headers))
+    except HTTPError as e:
+        if e.code == 304:
+            log.info('Not modified: %s' % url)
+            return False
+        if e.code == 416 and offset:  # partial file is no good, start over
+            os.remove(part)
+            return fetch(url, dest, sha256, reporthook, block_size)
+        raise
+
+    try:
+        if response.getcode() != 206:  # whole file sent
+            offset = 0
+        _save_validators(part, response.info())
+        length = response.info().get('Content-Length')
+        total = offset + int(length) if length else -1
+
+        log.info('Downloading %s to %s, from byte %i' % (url, dest, offset))
+        if not _read_response(response, part, offset, total, reporthook, block_size):
+            return False
+    finally:
+        response.close()
+
+    _finish_download(dest, part, sha256)
+    return True
+
+
+def _fetch_zip(url, dest, sha256=None, reporthook=None):
+    """Fetch a zip to *dest* unless valid there, resuming an invalid one."""
+    if os.path.isfile(dest) and not has_valid_zip(dest):
+        log.info('Resuming download of incomplete %s' % dest)
+        _move(dest, dest + '.part')
+        if os.path.isfile(_headers_path(dest)):
+            _move(_headers_path(dest), _headers_path(dest + '.part'))
+    if not os.path.isfile(dest):
+        log.info('Downloading %s to %s' % (url, dest))
+        fetch(url, dest, sha256=sha256, reporthook=reporthook)
+
+
+def download(url, dest, urlretrieve_fn=urlretrieve, reporthook=None, sha256=None):
     """
     Download file at URL to a destination.
 
+    HTTP(S) URLs are downloaded with :func:`fetch`, resuming a partial
+    download, unless another *urlretrieve_fn* is passed. An invalid zip at
+    *dest*, e.g. cut short, is resumed too, whether or not UNIHAN files are
+    extracted next to it.
+
     Parameters
     ----------
     url : str
@@ -266,17 +648,28 @@ def download(url, dest, urlretrieve_fn=urlretrieve, reporthook=None):
         function to download file
     reporthook : function
         Function to write progress bar to stdout buffer.
+    sha256 : str, optional
+        expected SHA-256 hex digest of the file
 
     Returns
     -------
     str :
         destination where file downloaded to.
+
+    Raises
+    ------
+    ValueError :
+        downloaded file doesn't match *sha256*
     """
 
     datadir = os.path.dirname(dest)
     if not os.path.exists(datadir):
         os.makedirs(datadir)
 
+    if urlretrieve_fn is urlretrieve and is_url(url):
+        _fetch_zip(url, dest, sha256, reporthook)
+        return dest
+
     def no_unihan_files_exist():
         return not glob.glob(os.path.join(datadir, 'Unihan*.txt'))
 
@@ -294,16 +687,22 @@ def download(url, dest, urlretrieve_fn=urlretrieve, reporthook=None):
             else:
                 urlretrieve_fn(url, dest)
 
+            if sha256:
+                check_sha256(dest, sha256)
+
     return dest
 
 
-def load_data(files):
+def load_data(files, zip_path=None):
     """
     Extract zip and process information into CSV's.
 
     Parameters
     ----------
     files : list of str
+    zip_path : str, optional
+        path to zip. If passed, *files* are member names read directly out of
+        the archive, no extraction to disk is needed.
 
     Returns
     -------
@@ -312,38 +711,119 @@ def load_data(files):
     """
 
     log.info('Loading data: %s.' % ', '.join(files))
-    raw_data = fileinput.FileInput(
-        files=files, openhook=fileinput.hook_encoded('utf-8')
-    )
+    if zip_path:
+        raw_data = load_zip_data(zip_path, files)
+    else:
+        raw_data = fileinput.FileInput(
+            files=files, openhook=fileinput.hook_encoded('utf-8')
+        )
     log.info('Done loading data.')
     return raw_data
 
 
-def extract_zip(zip_path, dest_dir):
+def load_mmap_data(files, fields):
+    """
+    Return lines of picked fields only, scanning memory-mapped files as bytes.
+
+    Field names are matched on bytes, only lines of *fields* are decoded.
+    Narrow builds skip decoding most of UNIHAN.
+
+    Parameters
+    ----------
+    files : list of str
+        paths of extracted UNIHAN files
+    fields : list of str
+        fields to keep lines of
+
+    Returns
+    -------
+    generator of str :
+        lines of the UNIHAN files, of *fields*
+    """
+    wanted = [field.encode('ascii') for field in fields if field not in INDEX_FIELDS]
+    names = b'|'.join(re.escape(field) for field in wanted)
+    pattern = re.compile(br'^U\+[0-9A-F]+\t(?:' + names + br')\t[^\n]*\n?', re.M)
+
+    log.info('Loading data (mmap): %s.' % ', '.join(files))
+    for path in files:
+        with open(path, 'rb') as f:
+            if not os.fstat(f.fileno()).st_size:
+                continue  # empty files can't be mapped
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for match in pattern.finditer(m):
+                    yield match.group().decode('utf-8')
+            finally:
+                m.close()
+
+
+def load_zip_data(zip_path, files):
+    """
+    Yield decoded lines of files inside of a zip, one file after another.
+
+    Parameters
+    ----------
+    zip_path : str
+        path to zip
+    files : list of str
+        members of zip file, e.g. ``['Unihan_Readings.txt']``
+
+    Returns
+    -------
+    generator of str :
+        lines of the UNIHAN files
+    """
+    with zipfile.ZipFile(zip_path) as z:
+        for f in files:
+            with io.TextIOWrapper(z.open(f), encoding='utf-8') as fp:
+                for line in fp:
+                    yield line
+
+
+def extract_zip(zip_path, dest_dir, members=None):
     """
     Extract zip file. Return :class:`zipfile.ZipFile` instance.
 
+    Members already extracted, matching the archive's size and CRC, are
+    skipped.
+
     Parameters
     ----------
     zip_file : str
         filepath to extract.
     dest_dir : str
         directory to extract to.
+    members : list of str, optional
+        members to extract, e.g. ``['Unihan_Readings.txt']``. All by default.
 
     Returns
     -------
     :class:`zipfile.ZipFile` :
-        The extracted zip.
+        The extracted zip, closed.
     """
 
-    z = zipfile.ZipFile(zip_path)
     log.info('extract_zip dest dir: %s' % dest_dir)
-    z.extractall(dest_dir)
+    with zipfile.ZipFile(zip_path) as z:
+        if members is None:
+            infos = z.infolist()
+        else:
+            infos = [z.getinfo(member) for member in members]
+
+        for info in infos:
+            path = os.path.join(dest_dir, info.filename)
+            if (
+                os.path.isfile(path)
+                and os.path.getsize(path) == info.file_size
+                and file_crc32(path) == info.CRC
+            ):
+                log.debug('Already extracted: %s' % path)
+                continue
+            z.extract(info, dest_dir)
 
     return z
 
 
-def normalize(raw_data, fields):
+def normalize(raw_data, fields, pool=None):
     """
     Return normalized data from a UNIHAN data files.
 
@@ -353,37 +833,163 @@ def normalize(raw_data, fields):
         combined text files from UNIHAN
     fields : list of str
         list of columns to pull
+    pool : :class:`~unihan_etl.util.ValuePool`, optional
+        share repeated values
 
     Returns
     -------
-    list :
-        list of unihan character information
+    :class:`~unihan_etl.store.ColumnStore` :
+        sequence of unihan character information, dict-like
+        :class:`~unihan_etl.store.Row`'s
     """
     log.info('Collecting field data...')
-    items = dict()
-    for idx, l in enumerate(raw_data):
-        if not_junk(l):
-            l = l.strip().split('\t')
-            if in_fields(l[1], fields):
-                item = dict(zip(['ucn', 'field', 'value'], l))
-                char = ucn_to_unicode(item['ucn'])
-                if char not in items:
-                    items[char] = dict().fromkeys(fields)
-                    items[char]['ucn'] = item['ucn']
-                    items[char]['char'] = char
-                items[char][item['field']] = text_type(item['value'])
-        if log.isEnabledFor(logging.DEBUG):
-            sys.stdout.write('\rProcessing line %i' % (idx))
-            sys.stdout.flush()
-
-    if log.isEnabledFor(logging.DEBUG):
-        sys.stdout.write('\n')
-        sys.stdout.flush()
-
-    return [i for i in items.values()]
-
-
-def expand_delimiters(normalized_data):
+    items = ColumnStore(fields)
+    wanted = frozenset(items.fields)
+    columns = items.columns
+    rows = {}  # ucn -> row number
+    debug = log.isEnabledFor(logging.DEBUG)
+    for idx, line in enumerate(raw_data):
+        if debug:
+            sys.stderr.write('\rProcessing line %i' % (idx))
+            sys.stderr.flush()
+        if line[0] == '#' or line == '\n':
+            continue
+
+        # Pick out the field first, unwanted lines are skipped before splitting.
+        tab = line.index('\t')
+        value_tab = line.index('\t', tab + 1)
+        field = line[tab + 1 : value_tab]
+        if field not in wanted:
+            continue
+
+        ucn = line[:tab]
+        row = rows.get(ucn)
+        if row is None:
+            char = ucn_to_unicode(ucn)
+            row = items.index.get(char)
+            if row is None:
+                row = items.add(char, ucn)
+            rows[ucn] = row
+        value = line[value_tab + 1 :].rstrip()
+        if pool is not None:
+            value = pool.intern(value)
+        columns[field][row] = value
+
+    if debug:
+        sys.stderr.write('\n')
+        sys.stderr.flush()
+
+    return items
+
+
+def _normalize_file(path, fields, zip_path=None, use_mmap=False):
+    """
+    Return chars, ucns and columns filled in one UNIHAN file.
+
+    Run in a worker process, columns the file has no values for aren't sent
+    back.
+    """
+    if use_mmap:
+        raw_data = load_mmap_data([path], fields)
+    else:
+        raw_data = load_data(files=[path], zip_path=zip_path)
+    items = normalize(raw_data, fields)
+    columns = {
+        field: column
+        for field, column in items.columns.items()
+        if field not in INDEX_FIELDS and any(v is not None for v in column)
+    }
+    return items.columns['char'], items.columns['ucn'], columns
+
+
+def normalize_files(files, fields, jobs=0, zip_path=None, use_mmap=False, pool=None):
+    """
+    Return normalized data, parsing each UNIHAN file in its own process.
+
+    Partial results are merged by codepoint, items are in the same order as
+    :func:`normalize` on the files chained.
+
+    Parameters
+    ----------
+    files : list of str
+        paths of UNIHAN files, or members of *zip_path*
+    fields : list of str
+        list of columns to pull
+    jobs : int, optional
+        number of processes, 0 for one per CPU
+    zip_path : str, optional
+        read *files* from this zip
+    use_mmap : bool, optional
+        read extracted files with :func:`load_mmap_data`
+    pool : :class:`~unihan_etl.util.ValuePool`, optional
+        share repeated values, as partial results are merged
+
+    Returns
+    -------
+    :class:`~unihan_etl.store.ColumnStore` :
+        sequence of unihan character information
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if jobs == 0:
+        jobs = multiprocessing.cpu_count()
+    jobs = max(1, min(jobs, len(files)))
+
+    items = ColumnStore(fields)
+    log.info('Parsing %i files with %i processes.' % (len(files), jobs))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(_normalize_file, path, fields, zip_path, use_mmap)
+            for path in files
+        ]
+
+        for future in futures:
+            chars, ucns, columns = future.result()
+            rows = [items.index.get(char) for char in chars]
+            for i, row in enumerate(rows):
+                if row is None:
+                    rows[i] = items.add(chars[i], ucns[i])
+
+            for field, values in columns.items():
+                column = items.columns[field]
+                for row, value in izip(rows, values):
+                    if value is not None:
+                        column[row] = value if pool is None else pool.intern(value)
+
+    return items
+
+
+def expand_record(char, cache=None, pool=None):
+    """
+    Expand multi-value fields of an item in place, return it.
+
+    Values are expanded through *cache*, an
+    :class:`~unihan_etl.expansion.ExpansionCache`, if passed. Strings of
+    expanded values are shared through *pool*, a
+    :class:`~unihan_etl.util.ValuePool`, if passed.
+    """
+    expand_field = cache.expand_field if cache is not None else expansion.expand_field
+    for field in char.keys():
+        if not char[field]:
+            continue
+        value = expand_field(field, char[field])
+        if pool is not None:
+            value = pool.intern_value(value)
+        char[field] = value
+
+    return char
+
+
+def prune_record(char):
+    """Remove empty fields of an item in place, return it."""
+    for field in list(char.keys()):
+        if not char[field]:
+            char.pop(field, None)
+
+    return char
+
+
+def expand_delimiters(normalized_data, jobs=1, cache=None, pool=None):
     """
     Return expanded multi-value fields in UNIHAN.
 
@@ -391,6 +997,14 @@ def expand_delimiters(normalized_data):
     ----------
     normalized_data : list of dict
         Expects data in list of hashes, per :meth:`process.normalize`
+    jobs : int, optional
+        number of processes to expand with, 0 for one per CPU. Custom
+        expanders must be registered at import, so they exist in the worker
+        processes.
+    cache : :class:`~unihan_etl.expansion.ExpansionCache`, optional
+        memoize expanded values, used when expanding in this process
+    pool : :class:`~unihan_etl.util.ValuePool`, optional
+        share repeated strings of expanded values
 
     Returns
     -------
@@ -399,15 +1013,224 @@ def expand_delimiters(normalized_data):
         will  be expanded. Including multi-value fields not using both fields
         (so all fields stay consistent).
     """
+    if jobs == 0:
+        jobs = multiprocessing.cpu_count()
+    if jobs > 1:
+        return expand_delimiters_parallel(normalized_data, jobs, pool)
+
     for char in normalized_data:
-        for field in char.keys():
-            if not char[field]:
-                continue
-            char[field] = expansion.expand_field(field, char[field])
+        expand_record(char, cache, pool)
 
     return normalized_data
 
 
+def _expand_chunks(chunks, jobs):
+    """
+    Yield chunks of items expanded in a pool of processes, in order.
+
+    Only a couple of chunks per worker are pending at a time, so *chunks* can
+    be a generator too big to hold in memory.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    log.info('Expanding with %i processes.' % jobs)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = collections.deque()
+        for chunk in chunks:
+            pending.append(executor.submit(expand_delimiters, chunk))
+            if len(pending) > jobs * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def expand_delimiters_parallel(normalized_data, jobs, pool=None):
+    """
+    Return expanded multi-value fields in UNIHAN, using a pool of processes.
+
+    Items are copied into chunks which are expanded in a
+    :class:`concurrent.futures.ProcessPoolExecutor`, then updated in place.
+
+    Parameters
+    ----------
+    normalized_data : list of dict
+        Expects data in list of hashes, per :meth:`process.normalize`
+    jobs : int
+        number of worker processes
+    pool : :class:`~unihan_etl.util.ValuePool`, optional
+        share repeated strings of items sent back
+
+    Returns
+    -------
+    list of dict :
+        expanded items, see :func:`expand_delimiters`
+    """
+    # A few chunks per worker evens out uneven chunks, without much pickling.
+    size = max(1, -(-len(normalized_data) // (jobs * 4)))
+    chunks = (
+        [dict(char) for char in normalized_data[i : i + size]]
+        for i in range(0, len(normalized_data), size)
+    )
+
+    expanded = (char for chunk in _expand_chunks(chunks, jobs) for char in chunk)
+    for char, expanded_char in izip(normalized_data, expanded):
+        if pool is not None:
+            expanded_char = pool.intern_value(expanded_char)
+        char.update(expanded_char)
+
+    return normalized_data
+
+
+def iter_records(raw_data, fields):
+    """
+    Yield normalized items, as dicts, one at a time.
+
+    Lines are merged per codepoint in a :class:`~unihan_etl.store.ColumnStore`
+    of raw values first, items are copied out of it.
+
+    Parameters
+    ----------
+    raw_data : str
+        combined text files from UNIHAN
+    fields : list of str
+        list of columns to pull
+
+    Returns
+    -------
+    generator of dict :
+        unihan character information, see :func:`normalize`
+    """
+    for char in normalize(raw_data, fields):
+        yield dict(char)
+
+
+def parse_fields(lines, fields):
+    """
+    Yield fields picked from lines of a UNIHAN file, checking codepoint order.
+
+    Parameters
+    ----------
+    lines : iterable of str
+        lines of one UNIHAN file
+    fields : list of str
+        list of columns to pull
+
+    Returns
+    -------
+    generator of tuple :
+        (codepoint, ucn, field, value), e.g. ``(13312, 'U+3400', 'kMandarin',
+        'qiū')``
+
+    Raises
+    ------
+    ValueError :
+        lines are not sorted by codepoint
+    """
+    wanted = frozenset(fields)
+    last_ucn = None
+    last_codepoint = -1
+    for line in lines:
+        if line[0] == '#' or line == '\n':
+            continue
+
+        tab = line.index('\t')
+        ucn = line[:tab]
+        if ucn != last_ucn:
+            codepoint = int(ucn[2:], 16)
+            if codepoint <= last_codepoint:
+                raise ValueError(
+                    'UNIHAN lines out of codepoint order: {0} after {1}'.format(
+                        ucn, last_ucn
+                    )
+                )
+            last_ucn, last_codepoint = ucn, codepoint
+
+        value_tab = line.index('\t', tab + 1)
+        field = line[tab + 1 : value_tab]
+        if field in wanted:
+            yield codepoint, ucn, field, line[value_tab + 1 :].rstrip()
+
+
+def merge_records(streams, fields):
+    """
+    Yield normalized items, in codepoint order, merged from sorted files.
+
+    Files are read at the same time, lines are merged on codepoint with a
+    heap. Only one item is held in memory at a time.
+
+    Parameters
+    ----------
+    streams : list of iterables of str
+        lines of each UNIHAN file, each sorted by codepoint
+    fields : list of str
+        list of columns to pull
+
+    Returns
+    -------
+    generator of dict :
+        unihan character information, see :func:`normalize`
+
+    Raises
+    ------
+    ValueError :
+        lines of a file are not sorted by codepoint
+    """
+    fields = list(fields) + [f for f in INDEX_FIELDS if f not in fields]
+    parsed = [parse_fields(lines, fields) for lines in streams]
+
+    record = None
+    for codepoint, ucn, field, value in heapq.merge(*parsed):
+        if record is None or record['ucn'] != ucn:
+            if record is not None:
+                yield record
+            record = dict.fromkeys(fields)
+            record['ucn'] = ucn
+            record['char'] = ucn_to_unicode(ucn)
+        record[field] = value
+
+    if record is not None:
+        yield record
+
+
+def expand_records(records, jobs=1, chunk_size=1000, cache=None):
+    """
+    Yield items with multi-value fields expanded, one at a time.
+
+    Parameters
+    ----------
+    records : iterable of dict
+        normalized items
+    jobs : int, optional
+        number of processes to expand with, see :func:`expand_delimiters`
+    chunk_size : int, optional
+        items sent to a process at a time, when *jobs* is more than one
+    cache : :class:`~unihan_etl.expansion.ExpansionCache`, optional
+        memoize expanded values, used when expanding in this process
+
+    Returns
+    -------
+    generator of dict :
+        expanded items, in order
+    """
+    if jobs == 0:
+        jobs = multiprocessing.cpu_count()
+    if jobs > 1:
+        records = iter(records)
+        chunks = iter(lambda: list(itertools.islice(records, chunk_size)), [])
+        for chunk in _expand_chunks(chunks, jobs):
+            for char in chunk:
+                yield char
+    else:
+        for char in records:
+            yield expand_record(char, cache)
+
+
+def prune_records(records):
+    """Yield items with empty fields removed, one at a time."""
+    for char in records:
+        yield prune_record(char)
+
+
 def listify(data, fields):
     """
     Convert tabularized data to a CSV-friendly list.
@@ -424,26 +1247,529 @@ def listify(data, fields):
 
 
 def export_csv(data, destination, fields):
-    data = listify(data, fields)
-
     with open(destination, 'w') as f:
         csvwriter = csv.writer(f)
-        csvwriter.writerows(data)
+        csvwriter.writerow(fields[:])
+        csvwriter.writerows(char.values() for char in data)
         log.info('Saved output to: %s' % destination)
 
 
-def export_json(data, destination):
+def _json_dumps(backend, compact):
+    """Return function serializing a value to a JSON string."""
+    if backend == 'orjson':
+        option = 0 if compact else orjson.OPT_INDENT_2
+        return lambda obj: orjson.dumps(obj, option=option).decode('utf-8')
+    elif backend == 'ujson':
+        return lambda obj: ujson.dumps(
+            obj,
+            ensure_ascii=False,
+            escape_forward_slashes=False,
+            indent=0 if compact else 2,
+        )
+
+    separators = (',', ':') if compact else (',', ': ')
+    return lambda obj: json.dumps(
+        obj, ensure_ascii=False, indent=None if compact else 2, separators=separators
+    )
+
+
+def export_json(data, destination, compact=False, backend=None):
+    """
+    Save data as a JSON array, one item at a time.
+
+    Parameters
+    ----------
+    data : iterable of dict
+        items, consumed once
+    destination : str
+        file path
+    compact : bool, optional
+        leave out indentation and spaces after separators
+    backend : str, optional
+        JSON encoder, ``orjson``, ``ujson`` or ``json``. Default:
+        :attr:`JSON_BACKEND`
+    """
+    dumps = _json_dumps(backend or JSON_BACKEND, compact)
+
     with codecs.open(destination, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.write('[')
+        count = 0
+        for char in data:
+            item = dumps(dict(char))
+            if not compact:
+                item = '\n  ' + item.replace('\n', '\n  ')
+            f.write(',' + item if count else item)
+            count += 1
+        f.write('\n]' if count and not compact else ']')
         log.info('Saved output to: %s' % destination)
 
 
+def get_shard_paths(destination, shards):
+    """
+    Return file paths of shards of destination.
+
+    Parameters
+    ----------
+    destination : str
+        file path, e.g. ``unihan.ndjson``
+    shards : int
+        number of shards
+
+    Returns
+    -------
+    list of str :
+        e.g. ``['unihan-00001-of-00002.ndjson', 'unihan-00002-of-00002.ndjson']``,
+        or ``[destination]`` for one shard
+    """
+    if shards <= 1:
+        return [destination]
+
+    root, ext = os.path.splitext(destination)
+    return ['%s-%05d-of-%05d%s' % (root, i, shards, ext) for i in range(1, shards + 1)]
+
+
+def export_ndjson(data, destination, shards=1, backend=None):
+    """
+    Save data as newline delimited JSON, one item per line.
+
+    Parameters
+    ----------
+    data : iterable of dict
+        items. Iterated twice when sharding, to balance codepoint ranges, so
+        iterators are read into a list first.
+    destination : str
+        file path
+    shards : int, optional
+        split into files by codepoint range, named per :func:`get_shard_paths`.
+        Each shard holds about the same number of items.
+    backend : str, optional
+        JSON encoder, see :func:`export_json`
+
+    Returns
+    -------
+    list of str :
+        file paths written
+    """
+    dumps = _json_dumps(backend or JSON_BACKEND, compact=True)
+    paths = get_shard_paths(destination, shards)
+    if shards > 1 and not isinstance(data, collections_abc.Sequence):
+        data = list(data)
+
+    # Lowest codepoint of each shard but the first.
+    codepoints = sorted(ord(char['char']) for char in data) if shards > 1 else []
+    boundaries = [
+        codepoints[len(codepoints) * i // shards]
+        for i in range(1, shards)
+        if codepoints
+    ]
+
+    files = [codecs.open(path, 'w', encoding='utf-8') for path in paths]
+    try:
+        for char in data:
+            shard = bisect.bisect_right(boundaries, ord(char['char']))
+            files[shard].write(dumps(dict(char)) + '\n')
+    finally:
+        for f in files:
+            f.close()
+
+    log.info('Saved output to: %s' % ', '.join(paths))
+    return paths
+
+
+def _arrow_table(data, fields):
+    """
+    Return :class:`pyarrow.Table` of data, a column per field.
+
+    Column types are inferred from values, expanded fields become structs and
+    lists. Columns mixing types which can't be unified are stored as JSON.
+    """
+    import pyarrow
+
+    columns = {field: [] for field in fields}
+    for char in data:
+        for field in fields:
+            columns[field].append(char.get(field))
+
+    arrays = []
+    for field in fields:
+        try:
+            arrays.append(pyarrow.array(columns[field]))
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+            log.info('Mixed types in %s, storing as JSON.' % field)
+            arrays.append(
+                pyarrow.array(
+                    [
+                        None if v is None else json.dumps(v, ensure_ascii=False)
+                        for v in columns[field]
+                    ],
+                    type=pyarrow.string(),
+                )
+            )
+        del columns[field]
+
+    return pyarrow.Table.from_arrays(arrays, names=list(fields))
+
+
+def export_parquet(data, destination, fields):
+    """
+    Save data as an Apache Parquet file, a column per field.
+
+    Requires pyarrow. Expanded fields are stored as structs and lists.
+
+    Parameters
+    ----------
+    data : iterable of dict
+    destination : str
+        file path
+    fields : list of str
+    """
+    import pyarrow.parquet
+
+    pyarrow.parquet.write_table(_arrow_table(data, fields), destination)
+    log.info('Saved output to: %s' % destination)
+
+
+def export_arrow(data, destination, fields):
+    """
+    Save data as an Apache Arrow IPC file, a column per field.
+
+    Requires pyarrow. Expanded fields are stored as structs and lists.
+
+    Parameters
+    ----------
+    data : iterable of dict
+    destination : str
+        file path
+    fields : list of str
+    """
+    import pyarrow.ipc
+
+    table = _arrow_table(data, fields)
+    with pyarrow.OSFile(destination, 'wb') as sink:
+        with pyarrow.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    log.info('Saved output to: %s' % destination)
+
+
 def export_yaml(data, destination):
     with codecs.open(destination, 'w', encoding='utf-8') as f:
-        yaml.safe_dump(data, stream=f, allow_unicode=True, default_flow_style=False)
+        yaml.safe_dump(
+            [dict(char) for char in data],
+            stream=f,
+            allow_unicode=True,
+            default_flow_style=False,
+        )
+        log.info('Saved output to: %s' % destination)
+
+
+def _sqlite_columns(item, prefix=''):
+    """
+    Return scalar values of a dict, and its lists, by column name.
+
+    Nested dicts are flattened, their keys prefixed by the parent's, e.g.
+    ``location_page``.
+    """
+    columns, lists = collections.OrderedDict(), collections.OrderedDict()
+    for key, value in item.items():
+        column = prefix + key
+        if isinstance(value, dict):
+            nested_columns, nested_lists = _sqlite_columns(value, column + '_')
+            columns.update(nested_columns)
+            lists.update(nested_lists)
+        elif isinstance(value, list):
+            lists[column] = value
+        else:
+            columns[column] = value
+    return columns, lists
+
+
+class _SQLiteTable(object):
+    """Table of characters, or of a list of values, filled in batches.
+
+    Dict values are flattened into columns, added as they are first seen.
+    List values go into a child table each, keyed by the parent's keys and
+    the position in the list: ``seq``, then ``seq2``, and so on.
+
+    Parameters
+    ----------
+    conn : :class:`sqlite3.Connection`
+    name : str
+        table name
+    keys : list of str
+        key columns, starting with ``char``
+    columns : list of str, optional
+        columns of an existing table, not indexed. Child tables are created.
+    """
+
+    def __init__(self, conn, name, keys, columns=None):
+        self.conn = conn
+        self.name = name
+        self.keys = list(keys)
+        #: column name to whether to index it
+        self.columns = collections.OrderedDict((c, False) for c in columns or [])
+        #: column name to child :class:`_SQLiteTable` holding its lists
+        self.children = collections.OrderedDict()
+        self.rows = []
+        if columns is None:
+            conn.execute(
+                'CREATE TABLE "%s" (%s, PRIMARY KEY (%s))'
+                % (
+                    name,
+                    ', '.join(
+                        ['"char" TEXT NOT NULL REFERENCES unihan']
+                        + ['"%s" INTEGER NOT NULL' % k for k in self.keys[1:]]
+                    ),
+                    ', '.join('"%s"' % k for k in self.keys),
+                )
+            )
+
+    def add(self, key, item):
+        """Add a row, *key* holds values of :attr:`keys`."""
+        if not isinstance(item, dict):
+            item = {'value': item}
+        columns, lists = _sqlite_columns(item)
+        for column in columns:
+            if column not in self.columns:
+                self.conn.execute(
+                    'ALTER TABLE "%s" ADD COLUMN "%s"' % (self.name, column)
+                )
+                self.columns[column] = True
+        self.rows.append((key, columns))
+
+        for column, values in lists.items():
+            child = self.children.get(column)
+            if child is None:
+                name = column if len(self.keys) == 1 else self.name + '_' + column
+                seq = 'seq' if len(self.keys) == 1 else 'seq%i' % len(self.keys)
+                child = self.children[column] = _SQLiteTable(
+                    self.conn, name, self.keys + [seq]
+                )
+            for seq, value in enumerate(values):
+                child.add(key + (seq,), value)
+
+    def flush(self):
+        """Insert rows added, and those of child tables."""
+        names = list(self.columns)
+        self.conn.executemany(
+            'INSERT INTO "%s" (%s) VALUES (%s)'
+            % (
+                self.name,
+                ', '.join('"%s"' % c for c in self.keys + names),
+                ', '.join('?' * (len(self.keys) + len(names))),
+            ),
+            (key + tuple(columns.get(c) for c in names) for key, columns in self.rows),
+        )
+        self.rows = []
+        for child in self.children.values():
+            child.flush()
+
+    def create_indexes(self):
+        """Index each column added, and those of child tables."""
+        for column, indexed in self.columns.items():
+            if indexed:
+                self.conn.execute(
+                    'CREATE INDEX "%s_%s" ON "%s" ("%s")'
+                    % (self.name, column, self.name, column)
+                )
+        for child in self.children.values():
+            child.create_indexes()
+
+
+def export_sqlite(data, destination, fields, batch_size=10000):
+    """
+    Save data to a SQLite database, in one pass over data.
+
+    Characters are stored in the ``unihan`` table, keyed by ``char`` and
+    indexed on ``ucn``. Expanded values are stored in indexed columns and
+    tables, a column or table per value:
+
+    - Dicts are flattened into a column per key, e.g. ``kMandarin_zh-Hans``.
+    - Lists go into a table per field, e.g. ``kCantonese (char, seq, value)``,
+      keyed by ``char`` and position ``seq``. Items which are dicts get a
+      column per key, e.g. ``kRSUnicode (char, seq, radical, strokes, ...)``.
+    - Lists in items go into a table of their own, e.g.
+      ``kHanyuPinyin_readings (char, seq, seq2, value)``.
+
+    Each column of expanded values is indexed. The ``unihan`` column of an
+    expanded field is left NULL.
+
+    Parameters
+    ----------
+    data : iterable of dict
+    destination : str
+        file path of database, replaced if exists
+    fields : list of str
+    batch_size : int, optional
+        rows inserted at a time
+    """
+    fields = [f for f in fields if f not in INDEX_FIELDS]
+
+    if os.path.exists(destination):
+        os.remove(destination)
+
+    conn = sqlite3.connect(destination)
+    try:
+        with conn:
+            conn.execute(
+                'CREATE TABLE unihan (%s)'
+                % ', '.join(
+                    ['"char" TEXT PRIMARY KEY', '"ucn" TEXT NOT NULL']
+                    + ['"%s" TEXT' % f for f in fields]
+                )
+            )
+            table = _SQLiteTable(conn, 'unihan', ['char'], ['ucn'] + fields)
+
+            for count, char in enumerate(data, 1):
+                item = {'ucn': char['ucn']}
+                for field in fields:
+                    value = char.get(field)
+                    if value is not None:
+                        item[field] = value
+                table.add((char['char'],), item)
+
+                if count % batch_size == 0:
+                    table.flush()
+
+            table.flush()
+            conn.execute('CREATE INDEX "unihan_ucn" ON unihan ("ucn")')
+            table.create_indexes()
+    finally:
+        conn.close()
+    log.info('Saved output to: %s' % destination)
+
+
+def export_pickle(data, destination):
+    """
+    Save a snapshot of built data, to be loaded by :func:`load_pickle`.
+
+    Parameters
+    ----------
+    data : iterable of dict
+        normalized, or expanded, data. Items not in a
+        :class:`~unihan_etl.store.ColumnStore` are stored in one, so snapshots
+        load the same way however they were built.
+    destination : str
+        file path
+    """
+    if not isinstance(data, ColumnStore):
+        store = ColumnStore(INDEX_FIELDS)
+        for char in data:
+            store.append(char)
+        data = store
+
+    with open(destination, 'wb') as f:
+        pickle.dump((PICKLE_VERSION, data), f, protocol=pickle.HIGHEST_PROTOCOL)
         log.info('Saved output to: %s' % destination)
 
 
+def load_pickle(path):
+    """
+    Return data from a snapshot saved by :func:`export_pickle`.
+
+    Loading a snapshot skips downloading, parsing and expanding UNIHAN.
+
+    .. warning::
+
+       Unpickling can run arbitrary code, only load snapshots you trust.
+
+    Parameters
+    ----------
+    path : str
+        file path of snapshot, e.g. from ``Packager({'format': 'pickle'})``
+
+    Returns
+    -------
+    :class:`~unihan_etl.store.ColumnStore` :
+        same as :meth:`Packager.export` with ``format='python'``
+
+    Raises
+    ------
+    ValueError :
+        snapshot was saved with an incompatible layout
+    """
+    with open(path, 'rb') as f:
+        snapshot = pickle.load(f)
+
+    if not (isinstance(snapshot, tuple) and snapshot[0] == PICKLE_VERSION):
+        raise ValueError('Unsupported snapshot layout in {0}.'.format(path))
+    return snapshot[1]
+
+
+def build_cache_key(zip_path, fields, expand, prune_empty, merge='store'):
+    """
+    Return key for data built from a zip with options.
+
+    Parameters
+    ----------
+    zip_path : str
+        path to zip
+    fields : list of str
+        fields built, in order
+    expand : bool
+        whether fields are expanded
+    prune_empty : bool
+        whether empty fields are pruned
+    merge : str, optional
+        merge mode, which orders items, see :attr:`MERGE_MODES`
+
+    Returns
+    -------
+    str :
+        hex digest of the zip's SHA-256, the options and unihan-etl's version
+    """
+    options = json.dumps(
+        [file_sha256(zip_path), list(fields), expand, prune_empty, merge, __version__]
+    )
+    return hashlib.sha256(options.encode('utf-8')).hexdigest()
+
+
+def save_build_cache(data, path, keep=BUILD_CACHE_SIZE):
+    """
+    Save built data to path as a pickle snapshot, atomically.
+
+    Other builds in the directory beyond the *keep* most recently used are
+    removed, with their export records.
+    """
+    cache_dir = os.path.dirname(path)
+    if not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    tmp_path = '%s.%i.tmp' % (path, os.getpid())
+    export_pickle(data, tmp_path)
+    os.rename(tmp_path, path)
+    log.info('Cached build to: %s' % path)
+    prune_build_cache(cache_dir, keep)
+
+
+def prune_build_cache(cache_dir, keep=BUILD_CACHE_SIZE):
+    """Remove builds, and their export records, but the *keep* last used."""
+    builds = sorted(
+        glob.glob(os.path.join(cache_dir, '*.pickle')),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for path in builds[keep:]:
+        for stale in glob.glob(path[: -len('.pickle')] + '.*'):
+            os.remove(stale)
+        log.info('Removed cached build: %s' % path)
+
+
+def load_build_cache(path):
+    """Return built data pickled at path, or ``None`` if missing or unreadable."""
+    if not os.path.isfile(path):
+        return None
+
+    try:
+        data = load_pickle(path)
+    except Exception as e:
+        log.info('Ignoring unreadable build cache %s: %s' % (path, e))
+        return None
+
+    os.utime(path, None)  # used last, kept longest
+    log.info('Loaded cached build from: %s' % path)
+    return data
+
+
 def validate_options(options):
     if 'input_files' in options and 'fields' not in options:
         # Filter fields when only files specified.
@@ -455,15 +1781,31 @@ def validate_options(options):
         # Filter files when only field specified.
         options['input_files'] = get_files(options['fields'])
     elif 'fields' in options and 'input_files' in options:
-        # Filter fields when only files specified.
-        fields_in_files = get_fields(filter_manifest(options['input_files']))
-
-        not_in_field = [h for h in options['fields'] if h not in fields_in_files]
+        # Only keep files holding the fields picked.
+        not_in_field = [
+            h
+            for h in options['fields']
+            if UNIHAN_FIELD_FILES.get(h) not in options['input_files']
+        ]
         if not_in_field:
             raise KeyError(
                 'Field {0} not found in file list.'.format(', '.join(not_in_field))
             )
 
+        files = get_files(options['fields'])
+        options['input_files'] = [f for f in options['input_files'] if f in files]
+
+    if options.get('jobs', 0) < 0:
+        raise ValueError(
+            'jobs must be 0 (one per CPU) or more, not {0}.'.format(options['jobs'])
+        )
+    if options.get('expand_cache', 0) < 0:
+        raise ValueError(
+            'expand_cache must be 0 (off) or more, not {0}.'.format(
+                options['expand_cache']
+            )
+        )
+
 
 class Packager(object):
     """Download and generate a tabular release of
@@ -481,6 +1823,22 @@ class Packager(object):
 
         self.options = merge_dict(DEFAULT_OPTIONS.copy(), options)
 
+        #: :class:`~unihan_etl.expansion.ExpansionCache` of values expanded,
+        #: with the ``expand_cache`` option. Hits and misses are counted.
+        self.expand_cache = None
+        if self.options['expand_cache']:
+            self.expand_cache = expansion.ExpansionCache(self.options['expand_cache'])
+
+        #: :class:`~unihan_etl.stats.BuildStats` of stages run: download,
+        #: extract, cache, normalize (reading lines included), expand, prune
+        #: and export. A streaming export's lines and items are counted
+        #: under export, where they run.
+        self.stats = BuildStats()
+
+        #: :class:`~unihan_etl.util.ValuePool` of values shared by the last
+        #: build, with the ``intern`` option. Bytes saved are counted.
+        self.value_pool = None
+
     def download(self, urlretrieve_fn=urlretrieve):
         """
         Download raw UNIHAN data if not exists.
@@ -490,31 +1848,87 @@ class Packager(object):
 
         urlretrieve_fn : function
             function to download file
-        """
-        while not has_valid_zip(self.options['zip_path']):
-            download(
-                self.options['source'],
-                self.options['zip_path'],
-                urlretrieve_fn=urlretrieve_fn,
-                reporthook=_dl_progress,
-            )
 
-        if not files_exist(self.options['work_dir'], self.options['input_files']):
-            extract_zip(self.options['zip_path'], self.options['work_dir'])
+        Notes
+        -----
+        With the ``refresh`` option, an existing zip is revalidated against
+        an HTTP(S) source, and extracted again if it changed.
+
+        A download cut short is resumed until the zip is complete. An attempt
+        making no progress raises :class:`IOError`.
+        """
+        # With stats on, stdout is kept for their JSON
+        out = sys.stderr if self.options['stats'] else sys.stdout
+        reporthook = functools.partial(_dl_progress, out=out)
+
+        with self.stats.stage('download'):
+            changed = False
+            if (
+                self.options['refresh']
+                and is_url(self.options['source'])
+                and has_valid_zip(self.options['zip_path'])
+            ):
+                changed = fetch(
+                    self.options['source'],
+                    self.options['zip_path'],
+                    sha256=self.options['sha256'],
+                    reporthook=reporthook,
+                )
+
+            def downloaded():
+                paths = [self.options['zip_path'] + '.part', self.options['zip_path']]
+                return sum(os.path.getsize(p) for p in paths if os.path.isfile(p))
+
+            while not has_valid_zip(self.options['zip_path']):
+                changed = True
+                size = downloaded()
+                download(
+                    self.options['source'],
+                    self.options['zip_path'],
+                    urlretrieve_fn=urlretrieve_fn,
+                    reporthook=reporthook,
+                    sha256=self.options['sha256'],
+                )
+                if not has_valid_zip(self.options['zip_path']) and downloaded() <= size:
+                    raise IOError(
+                        'Download of {0} made no progress, no valid zip at {1}.'.format(
+                            self.options['source'], self.options['zip_path']
+                        )
+                    )
+
+        if not self.options['extract']:
+            return
+
+        if changed or not files_exist(
+            self.options['work_dir'], self.options['input_files']
+        ):
+            with self.stats.stage('extract'):
+                extract_zip(
+                    self.options['zip_path'],
+                    self.options['work_dir'],
+                    members=self.options['input_files'],
+                )
 
     def export(self):
-        """Extract zip and process information into CSV's."""
+        """
+        Extract zip and process information into CSV's.
+
+        With the ``stream`` option, items are expanded, pruned and exported
+        one at a time. ``format='python'`` returns a generator of items then.
+        With ``merge='kway'`` too, items are merged from all files read at
+        once, in codepoint order, so memory use stays flat for exports which
+        write as items come (not parquet, arrow, pickle or sharded ndjson).
+
+        With the ``lazy`` option, ``format='python'`` returns a
+        :class:`~unihan_etl.store.LazyColumnStore`: fields are expanded the
+        first time they're read. Only fields empty before expansion are pruned.
+        """
 
         fields = self.options['fields']
         for k in INDEX_FIELDS:
             if k not in fields:
                 fields = [k] + fields
 
-        files = [
-            os.path.join(self.options['work_dir'], f)
-            for f in self.options['input_files']
-        ]
-
         # Replace {ext} with extension to use.
         self.options['destination'] = self.options['destination'].format(
             ext=self.options['format']
@@ -523,29 +1937,213 @@ class Packager(object):
         if not os.path.exists(os.path.dirname(self.options['destination'])):
             os.makedirs(os.path.dirname(self.options['destination']))
 
-        data = load_data(files=files)
-        data = normalize(data, fields)
+        expand = self.options['expand'] and self.options['format'] != 'csv'
+        lazy = (
+            expand
+            and self.options['lazy']
+            and self.options['format'] == 'python'
+            and not self.options['stream']
+        )
+        if lazy:
+            expand = False  # on access instead
+
+        cache_path = None
+        if self.options['cache'] and os.path.isfile(self.options['zip_path']):
+            key = build_cache_key(
+                self.options['zip_path'],
+                fields,
+                expand,
+                self.options['prune_empty'],
+                self.options['merge'],
+            )
+            cache_path = os.path.join(self.options['cache_dir'], key)
+
+            if self.options['format'] != 'python' and self._exported(cache_path):
+                log.info('Up to date: %s' % self.options['destination'])
+                return
+
+        data = None
+        if cache_path:
+            with self.stats.stage('cache') as stage:
+                data = load_build_cache(cache_path + '.pickle')
+                stage.records = len(data) if data is not None else None
+        if data is None and not self.options['stream']:
+            data = self._build(fields, expand)
+            if cache_path:
+                save_build_cache(data, cache_path + '.pickle')
+
+        with self.stats.stage('export') as stage:
+            if data is None:  # streamed, stages run as the exporter consumes
+                data = stage.count_records(self._pipeline(fields, expand, stage))
+            else:
+                stage.records = len(data)
+
+            if self.options['format'] == 'json':
+                export_json(
+                    data, self.options['destination'], compact=self.options['compact']
+                )
+            elif self.options['format'] == 'ndjson':
+                export_ndjson(
+                    data, self.options['destination'], shards=self.options['shards']
+                )
+            elif self.options['format'] == 'csv':
+                export_csv(data, self.options['destination'], fields)
+            elif self.options['format'] == 'yaml':
+                export_yaml(data, self.options['destination'])
+            elif self.options['format'] == 'parquet':
+                export_parquet(data, self.options['destination'], fields)
+            elif self.options['format'] == 'arrow':
+                export_arrow(data, self.options['destination'], fields)
+            elif self.options['format'] == 'pickle':
+                export_pickle(data, self.options['destination'])
+            elif self.options['format'] == 'sqlite':
+                export_sqlite(data, self.options['destination'], fields)
+            elif self.options['format'] == 'python':
+                if lazy:
+                    if self.options['prune_empty']:
+                        data.prune()
+                    return LazyColumnStore.from_store(data)
+                return data
+            else:
+                log.info('Format %s does not exist' % self.options['format'])
+                return
+
+        if cache_path:
+            self._record_export(cache_path)
+
+    def _input_files(self):
+        """Return paths of UNIHAN files picked, and zip to read them from."""
+        if self.options['extract']:
+            files = [
+                os.path.join(self.options['work_dir'], f)
+                for f in self.options['input_files']
+            ]
+            return files, None
+
+        return list(self.options['input_files']), self.options['zip_path']
+
+    def _use_mmap(self):
+        return self.options['mmap'] and self.options['extract']
+
+    def _load_data(self, fields):
+        """Return lines of UNIHAN files picked."""
+        files, zip_path = self._input_files()
+        if self._use_mmap():
+            return load_mmap_data(files, fields)
+        return load_data(files=files, zip_path=zip_path)
+
+    def _load_streams(self, fields):
+        """Return lines of each UNIHAN file picked, to read at the same time."""
+        files, zip_path = self._input_files()
+        if self._use_mmap():
+            return [load_mmap_data([f], fields) for f in files]
+        return [load_data(files=[f], zip_path=zip_path) for f in files]
+
+    def _build(self, fields, expand):
+        """Return normalized, and if *expand*, expanded and pruned data."""
+        pool = self.value_pool = ValuePool() if self.options['intern'] else None
+
+        with self.stats.stage('normalize') as stage:
+            if self.options['merge'] == 'kway':
+                data = ColumnStore(fields)
+                streams = [stage.count_lines(s) for s in self._load_streams(fields)]
+                for char in merge_records(streams, fields):
+                    data.append(char if pool is None else pool.intern_value(char))
+            elif self.options['jobs'] != 1 and len(self.options['input_files']) > 1:
+                files, zip_path = self._input_files()
+                data = normalize_files(
+                    files,
+                    fields,
+                    self.options['jobs'],
+                    zip_path,
+                    self._use_mmap(),
+                    pool,
+                )
+            else:
+                lines = stage.count_lines(self._load_data(fields))
+                data = normalize(lines, fields, pool)
+            stage.records = len(data)
 
         # expand data hierarchically
-        if self.options['expand'] and self.options['format'] != 'csv':
-            data = expand_delimiters(data)
+        if expand:
+            with self.stats.stage('expand') as stage:
+                data = expand_delimiters(
+                    data, jobs=self.options['jobs'], cache=self.expand_cache, pool=pool
+                )
+                stage.records = len(data)
 
             if self.options['prune_empty']:
-                for char in data:
-                    for field in list(char.keys()):
-                        if not char[field]:
-                            char.pop(field, None)
-
-        if self.options['format'] == 'json':
-            export_json(data, self.options['destination'])
-        elif self.options['format'] == 'csv':
-            export_csv(data, self.options['destination'], fields)
-        elif self.options['format'] == 'yaml':
-            export_yaml(data, self.options['destination'])
-        elif self.options['format'] == 'python':
-            return data
+                with self.stats.stage('prune') as stage:
+                    for char in data:
+                        prune_record(char)
+                    stage.records = len(data)
+
+        if pool is not None:
+            pool.clear()  # values stay shared, the table isn't needed anymore
+            log.info(
+                'Shared %i repeated values, %.1f MiB saved.'
+                % (pool.hits, pool.saved / 1024.0 / 1024)
+            )
+
+        return data
+
+    def _pipeline(self, fields, expand, stage=None):
+        """
+        Return generator of items through stages, one item at a time.
+
+        Stages: parse and merge per codepoint (:func:`iter_records`, or
+        :func:`merge_records` with ``merge='kway'``), expand
+        (:func:`expand_records`), prune (:func:`prune_records`). Exporters
+        consume the generator.
+
+        Lines read are counted in *stage*, a :class:`~unihan_etl.stats.Stage`.
+        """
+        count = stage.count_lines if stage is not None else iter
+        if self.options['merge'] == 'kway':
+            streams = [count(s) for s in self._load_streams(fields)]
+            records = merge_records(streams, fields)
         else:
-            log.info('Format %s does not exist' % self.options['format'])
+            records = iter_records(count(self._load_data(fields)), fields)
+
+        if expand:
+            records = expand_records(
+                records, jobs=self.options['jobs'], cache=self.expand_cache
+            )
+
+            if self.options['prune_empty']:
+                records = prune_records(records)
+
+        return records
+
+    def _export_paths(self):
+        """Return file paths written by export."""
+        if self.options['format'] == 'ndjson':
+            return get_shard_paths(self.options['destination'], self.options['shards'])
+        return [self.options['destination']]
+
+    def _export_record(self):
+        """Return options shaping exported files, and checksums of the files."""
+        return {
+            'options': {k: self.options[k] for k in ('compact', 'shards')},
+            'files': {path: file_sha256(path) for path in self._export_paths()},
+        }
+
+    def _exported(self, cache_path):
+        """Return True if destination holds the export recorded for a build."""
+        record_path = '%s.%s.json' % (cache_path, self.options['format'])
+        paths = self._export_paths()
+        if not (os.path.isfile(record_path) and all(map(os.path.isfile, paths))):
+            return False
+
+        with open(record_path) as f:
+            record = json.load(f)
+        return record == self._export_record()
+
+    def _record_export(self, cache_path):
+        """Record options and checksums of files exported from a build."""
+        record_path = '%s.%s.json' % (cache_path, self.options['format'])
+        with open(record_path, 'w') as f:
+            json.dump(self._export_record(), f)
 
     @classmethod
     def from_cli(cls, argv):
@@ -596,3 +2194,5 @@ if __name__ == "__main__":
     p = Packager.from_cli(sys.argv[1:])
     p.download()
     p.export()
+    if p.options['stats'] == 'json':
+        print(p.stats.to_json())
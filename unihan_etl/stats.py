@@ -0,0 +1,170 @@
+# -*- coding: utf8 -*-
+"""Timing and memory use of build stages.
+
+stats
+~~~~~
+
+:class:`BuildStats` records, per stage (download, extract, normalize, expand,
+prune, export, ...), wall and CPU time, peak RSS, line and record counts.
+Peak memory traced by :mod:`tracemalloc` is recorded too, when it's tracing
+(e.g. ``python -X tracemalloc``), as tracing slows builds down.
+"""
+from __future__ import absolute_import, unicode_literals
+
+import collections
+import contextlib
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:  # python 2
+    tracemalloc = None
+
+try:
+    process_time = time.process_time
+except AttributeError:  # python 2
+    process_time = time.clock
+
+try:
+    wall_time = time.perf_counter
+except AttributeError:  # python 2
+    wall_time = time.time
+
+
+def max_rss():
+    """Return peak resident set size of the process so far, in bytes."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class Stage(object):
+    """Measurements of a build stage.
+
+    Parameters
+    ----------
+    name : str
+        stage name, e.g. ``'normalize'``
+    """
+
+    def __init__(self, name):
+        self.name = name
+        #: float: seconds elapsed
+        self.wall = None
+        #: float: seconds of CPU time used by this process
+        self.cpu = None
+        #: int: peak RSS of the process at the end of the stage, in bytes
+        self.max_rss = None
+        #: int: peak memory traced during the stage, in bytes
+        self.traced_peak = None
+        #: int: lines of UNIHAN files read
+        self.lines = None
+        #: int: items (characters) out of the stage
+        self.records = None
+
+    def count_lines(self, lines):
+        """Yield lines, counting them."""
+        self.lines = self.lines or 0
+        for line in lines:
+            self.lines += 1
+            yield line
+
+    def count_records(self, records):
+        """Yield items, counting them."""
+        self.records = self.records or 0
+        for record in records:
+            self.records += 1
+            yield record
+
+    def as_dict(self):
+        """Return measurements, for JSON."""
+        return collections.OrderedDict(
+            [
+                ('name', self.name),
+                ('wall', self.wall),
+                ('cpu', self.cpu),
+                ('max_rss', self.max_rss),
+                ('traced_peak', self.traced_peak),
+                ('lines', self.lines),
+                ('records', self.records),
+            ]
+        )
+
+    def __repr__(self):
+        items = self.as_dict().items()
+        return 'Stage(%s)' % ', '.join('%s=%r' % item for item in items)
+
+
+class BuildStats(object):
+    """Measurements of build stages, in the order they ran."""
+
+    def __init__(self):
+        #: :class:`collections.OrderedDict`: stage name to :class:`Stage`
+        self.stages = collections.OrderedDict()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Measure a stage, the block's :class:`Stage` is yielded for counts.
+
+        A stage run again is measured anew.
+
+        Parameters
+        ----------
+        name : str
+            stage name
+        """
+        stage = Stage(name)
+        self.stages.pop(name, None)
+        self.stages[name] = stage
+
+        tracing = tracemalloc is not None and tracemalloc.is_tracing()
+        if tracing and hasattr(tracemalloc, 'reset_peak'):  # python 3.9+
+            tracemalloc.reset_peak()
+        wall, cpu = wall_time(), process_time()
+        try:
+            yield stage
+        finally:
+            stage.wall = wall_time() - wall
+            stage.cpu = process_time() - cpu
+            stage.max_rss = max_rss()
+            if tracing:
+                stage.traced_peak = tracemalloc.get_traced_memory()[1]
+
+    def __getitem__(self, name):
+        return self.stages[name]
+
+    def __contains__(self, name):
+        return name in self.stages
+
+    def as_dict(self):
+        """Return stages and totals, for JSON."""
+        stages = list(self.stages.values())
+        rss = [s.max_rss for s in stages if s.max_rss is not None]
+        return collections.OrderedDict(
+            [
+                ('stages', [s.as_dict() for s in stages]),
+                (
+                    'total',
+                    collections.OrderedDict(
+                        [
+                            ('wall', sum(s.wall for s in stages)),
+                            ('cpu', sum(s.cpu for s in stages)),
+                            ('max_rss', max(rss) if rss else None),
+                        ]
+                    ),
+                ),
+            ]
+        )
+
+    def to_json(self):
+        """Return stages and totals as JSON."""
+        return json.dumps(self.as_dict(), indent=2)
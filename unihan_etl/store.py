@@ -0,0 +1,237 @@
+# -*- coding: utf8 -*-
+"""Columnar storage of normalized UNIHAN data.
+
+store
+~~~~~
+
+Each character held as a dict with ~90 mostly empty fields dominates memory on
+full builds. :class:`ColumnStore` keeps one list per field instead, and hands out
+:class:`Row` views which behave like the dicts they replace.
+"""
+from __future__ import absolute_import, unicode_literals
+
+from . import expansion
+from ._compat import collections_abc
+from .constants import INDEX_FIELDS
+
+
+class _Missing(object):
+    def __repr__(self):
+        return 'MISSING'
+
+    def __reduce__(self):
+        return 'MISSING'  # unpickle as this module's singleton
+
+
+#: Marker for a field removed from a row, e.g. by pruning. ``None`` is a value.
+MISSING = _Missing()
+
+
+class Row(collections_abc.MutableMapping):
+    """Dict-like view of a character in a :class:`ColumnStore`.
+
+    Reads and writes go straight to the store's columns.
+    """
+
+    __slots__ = ('_store', '_row')
+
+    def __init__(self, store, row):
+        self._store = store
+        self._row = row
+
+    def __getitem__(self, field):
+        value = self._store.columns[field][self._row]
+        if value is MISSING:
+            raise KeyError(field)
+        return value
+
+    def __setitem__(self, field, value):
+        if field not in self._store.columns:
+            self._store.add_field(field)
+        self._store.columns[field][self._row] = value
+
+    def __delitem__(self, field):
+        self[field]  # raise KeyError if not set
+        self._store.columns[field][self._row] = MISSING
+
+    def __iter__(self):
+        columns = self._store.columns
+        for field in self._store.fields:
+            if columns[field][self._row] is not MISSING:
+                yield field
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def copy(self):
+        """Return a :class:`dict` of the row's fields."""
+        return dict(self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class LazyRow(Row):
+    """:class:`Row` expanding a field's raw value the first time it's read.
+
+    The expanded value replaces the raw one in the store.
+    """
+
+    __slots__ = ()
+
+    def __getitem__(self, field):
+        value = Row.__getitem__(self, field)
+        expanded = self._store.expanded_flags(field)
+        if not expanded[self._row]:
+            if value:
+                value = expansion.expand_field(field, value)
+                self._store.columns[field][self._row] = value
+            expanded[self._row] = 1
+        return value
+
+    def __setitem__(self, field, value):
+        Row.__setitem__(self, field, value)
+        self._store.expanded_flags(field)[self._row] = 1
+
+
+class ColumnStore(collections_abc.Sequence):
+    """Normalized UNIHAN characters, stored as one list per field.
+
+    Items are :class:`Row` views, in the order characters were added.
+
+    Parameters
+    ----------
+    fields : list of str
+        fields (columns) to store. :attr:`~.INDEX_FIELDS` are always included.
+    """
+
+    #: type of row views handed out
+    row_type = Row
+
+    def __init__(self, fields):
+        #: list of str: field names, in order
+        self.fields = list(fields) + [f for f in INDEX_FIELDS if f not in fields]
+        #: dict: field name to list of values, one per row
+        self.columns = {field: [] for field in self.fields}
+        #: dict: character to row number
+        self.index = {}
+
+    def add(self, char, ucn):
+        """
+        Add an empty row for a character, return its row number.
+
+        Parameters
+        ----------
+        char : str
+            character, e.g. ``'㐀'``
+        ucn : str
+            codepoint, e.g. ``'U+3400'``
+
+        Returns
+        -------
+        int :
+            row number
+        """
+        row = len(self)
+        for column in self.columns.values():
+            column.append(None)
+        self.columns['ucn'][row] = ucn
+        self.columns['char'][row] = char
+        self.index[char] = row
+        return row
+
+    def append(self, item):
+        """
+        Add a row from a dict-like item, return its row number.
+
+        Parameters
+        ----------
+        item : dict
+            character's fields, including ``char`` and ``ucn``. Fields it
+            doesn't hold are missing in the row, as if pruned.
+
+        Returns
+        -------
+        int :
+            row number
+        """
+        row = self.add(item['char'], item['ucn'])
+        for field in self.fields:
+            if field not in item:
+                self.columns[field][row] = MISSING
+        view = Row(self, row)
+        for field, value in item.items():
+            view[field] = value
+        return row
+
+    def add_field(self, field):
+        """Add a column, missing in every existing row."""
+        self.fields.append(field)
+        self.columns[field] = [MISSING] * len(self)
+
+    def prune(self):
+        """Remove empty values from every row, column by column."""
+        for field, column in self.columns.items():
+            column[:] = [value if value else MISSING for value in column]
+
+    def get(self, char):
+        """Return :class:`Row` of character, or ``None`` if not stored."""
+        row = self.index.get(char)
+        return None if row is None else self.row_type(self, row)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.row_type(self, row) for row in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('row index out of range')
+        return self.row_type(self, i)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self.row_type(self, row)
+
+    def __len__(self):
+        return len(self.columns['char'])
+
+    def __eq__(self, other):
+        if not isinstance(other, collections_abc.Sequence):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+
+class LazyColumnStore(ColumnStore):
+    """Normalized UNIHAN characters, expanded field by field on access.
+
+    Items are :class:`LazyRow` views. Fields never read are never expanded.
+    """
+
+    row_type = LazyRow
+
+    def __init__(self, fields):
+        super(LazyColumnStore, self).__init__(fields)
+        #: dict: field name to :class:`bytearray`, 1 for each row expanded
+        self.expanded = {}
+
+    def expanded_flags(self, field):
+        """Return :class:`bytearray` of rows of a field expanded, 1 if so."""
+        flags = self.expanded.get(field)
+        if flags is None:
+            flags = self.expanded[field] = bytearray(len(self))
+        elif len(flags) < len(self):  # rows added since
+            flags.extend(bytearray(len(self) - len(flags)))
+        return flags
+
+    @classmethod
+    def from_store(cls, store):
+        """Return lazy store sharing the columns of a :class:`ColumnStore`."""
+        lazy = cls(store.fields)
+        lazy.fields, lazy.columns, lazy.index = store.fields, store.columns, store.index
+        return lazy
@@ -7,40 +7,52 @@ util
 """
 from __future__ import absolute_import, unicode_literals
 
-import collections
+import hashlib
 import re
 import sys
+import zlib
 
-from ._compat import string_types, text_type, unichr
+from ._compat import collections_abc, string_types, text_type, unichr
 
 
-def ucn_to_unicode(ucn):
-    """Return a python unicode value from a UCN.
+#: UCN to character, memoized by :func:`ucn_to_unicode`. UNIHAN has ~90k
+#: distinct codepoints, seen once per field line.
+_UCN_CACHE = {}
 
-    Converts a Unicode Universal Character Number (e.g. "U+4E00" or "4E00") to
-    Python unicode (u'\\u4e00')"""
+UCN_PATTERN = re.compile(r'U\+[0-9a-fA-F]+')
+
+
+def _ucn_to_unicode(ucn):
     if isinstance(ucn, string_types):
-        ucn = ucn.strip("U+")
-        if len(ucn) > int(4):
-            char = b'\U' + format(int(ucn, 16), '08x').encode('latin1')
-            char = char.decode('unicode_escape')
-        else:
-            char = unichr(int(ucn, 16))
-    else:
+        ucn = int(ucn.strip("U+"), 16)
+
+    try:
         char = unichr(ucn)
+    except ValueError:  # python 2 narrow build, outside the BMP
+        char = (b'\\U' + format(ucn, '08x').encode('latin1')).decode('unicode_escape')
 
     assert isinstance(char, text_type)
 
     return char
 
 
+def ucn_to_unicode(ucn):
+    """Return a python unicode value from a UCN.
+
+    Converts a Unicode Universal Character Number (e.g. "U+4E00" or "4E00") to
+    Python unicode (u'\\u4e00'). Results are memoized."""
+    try:
+        return _UCN_CACHE[ucn]
+    except KeyError:
+        char = _UCN_CACHE[ucn] = _ucn_to_unicode(ucn)
+        return char
+
+
 def ucnstring_to_python(ucn_string):
     """Return string with Unicode UCN (e.g. "U+4E00") to native Python Unicode
     (u'\\u4e00').
     """
-    res = re.findall("U\+[0-9a-fA-F]*", ucn_string)
-    for r in res:
-        ucn_string = ucn_string.replace(text_type(r), text_type(ucn_to_unicode(r)))
+    ucn_string = UCN_PATTERN.sub(lambda m: ucn_to_unicode(m.group()), ucn_string)
 
     ucn_string = ucn_string.encode('utf-8')
 
@@ -56,7 +68,72 @@ def ucnstring_to_unicode(ucn_string):
     return ucn_string
 
 
-def _dl_progress(count, block_size, total_size, out=sys.stdout):
+def file_sha256(path, block_size=1 << 16):
+    """Return hex SHA-256 digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_crc32(path, block_size=1 << 16):
+    """Return CRC-32 of a file's contents, as stored in zip files."""
+    crc = 0
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            crc = zlib.crc32(block, crc)
+    return crc & 0xFFFFFFFF
+
+
+class ValuePool(object):
+    """Shared instances of repeated values, e.g. field values and tokens.
+
+    Values like stroke counts, IRG source prefixes, readings and page numbers
+    repeat across thousands of characters. Each distinct string or int is
+    kept once.
+    """
+
+    #: types of values shared, ``bool`` isn't (``True == 1``)
+    types = frozenset([text_type, int])
+
+    def __init__(self):
+        #: dict: value to its shared instance
+        self.values = {}
+        #: int: values replaced by a shared instance
+        self.hits = 0
+        #: int: bytes of values replaced by a shared instance
+        self.saved = 0
+
+    def intern(self, value):
+        """Return shared instance of a string or int."""
+        pooled = self.values.setdefault(value, value)
+        if pooled is not value:
+            self.hits += 1
+            self.saved += sys.getsizeof(value)
+        return pooled
+
+    def intern_value(self, value):
+        """Return value with strings and ints shared, containers updated in place."""
+        if type(value) in self.types:
+            return self.intern(value)
+        if isinstance(value, list):
+            for i, v in enumerate(value):
+                value[i] = self.intern_value(v)
+        elif isinstance(value, dict):
+            for k, v in value.items():
+                value[k] = self.intern_value(v)
+        return value
+
+    def clear(self):
+        """Drop the table of shared values, counts are kept."""
+        self.values = {}
+
+    def __len__(self):
+        return len(self.values)
+
+
+def _dl_progress(count, block_size, total_size, out=None):
     """
     MIT License: https://github.com/okfn/dpm-old/blob/master/dpm/util.py
 
@@ -74,8 +151,10 @@ def _dl_progress(count, block_size, total_size, out=sys.stdout):
         else:
             return '%ib' % bytes
 
+    if out is None:
+        out = sys.stdout
     if not count:
-        print('Total size: %s' % format_size(total_size))
+        out.write('Total size: %s\n' % format_size(total_size))
     last_percent = int((count - 1) * block_size * 100 / total_size)
     # may have downloaded less if count*block_size > total_size
     maxdownloaded = count * block_size
@@ -88,7 +167,7 @@ def _dl_progress(count, block_size, total_size, out=sys.stdout):
         )
         out.flush()
     if maxdownloaded >= total_size:
-        print('\n')
+        out.write('\n\n')
 
 
 def merge_dict(base, additional):
@@ -99,14 +178,14 @@ def merge_dict(base, additional):
         return base
 
     if not (
-        isinstance(base, collections.Mapping)
-        and isinstance(additional, collections.Mapping)
+        isinstance(base, collections_abc.Mapping)
+        and isinstance(additional, collections_abc.Mapping)
     ):
         return additional
 
     merged = base
     for key, value in additional.items():
-        if isinstance(value, collections.Mapping):
+        if isinstance(value, collections_abc.Mapping):
             merged[key] = merge_dict(merged.get(key), value)
         else:
             merged[key] = value